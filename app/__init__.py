@@ -4,19 +4,23 @@ import click
 from flask import Flask
 from dotenv import load_dotenv
 
-from app.extensions import db, login_manager
+from app import json_provider
+from app.extensions import db, login_manager, telegram
 from app.models import User
 
 load_dotenv()
 
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     app.config.from_object('app.config.Config')
+    app.config.update(config or {})
 
     # Init extensions
+    json_provider.init_app(app)
     db.init_app(app)
     login_manager.init_app(app)
+    telegram.init_app(app)
 
     @login_manager.user_loader
     def load_user(user_id):
@@ -30,6 +34,7 @@ def create_app():
     from app.stats import stats_bp
     from app.settings import settings_bp
     from app.telegram.webhook import webhook_bp
+    from app.metrics import metrics_bp, register_source
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(dashboard_bp)
@@ -38,35 +43,119 @@ def create_app():
     app.register_blueprint(stats_bp)
     app.register_blueprint(settings_bp)
     app.register_blueprint(webhook_bp)
+    app.register_blueprint(metrics_bp)
 
-    # Start scheduler
-    from app.scheduler.jobs import init_scheduler
-    init_scheduler(app)
+    from app.stats.cache import stats_cache
+    from app.telegram import inbox, outbox
+    from app.telegram.payloads import payload_cache
+    from app.telegram.pending import pending_index
+    stats_cache.init_app(app)
+    pending_index.init_app(app)
+    register_source('telegram_rate_limit', telegram.limiter.stats)
+    register_source('telegram_scheduler_rate_limit', telegram.scheduler_limiter.stats)
+    register_source('outbox', outbox.stats)
+    register_source('inbox', inbox.stats)
+    register_source('pending_index', pending_index.stats)
+    register_source('payload_cache', payload_cache.stats)
+    register_source('stats_cache', stats_cache.stats)
+
+    # Start scheduler and background senders (not for CLI commands other
+    # than `flask run`, which must not take the scheduler lease)
+    if app.config.get('BACKGROUND_JOBS', True) and _serving():
+        from app.scheduler.jobs import init_scheduler
+        init_scheduler(app)
+        outbox.dispatcher.init_app(app)
+        if app.config.get('TELEGRAM_WEBHOOK_INBOX'):
+            inbox.consumer.init_app(app)
 
     # CLI commands
     @app.cli.command('db-init')
     def db_init():
         """Create all database tables."""
-        db.create_all()
+        from app.migrations import upgrade
+        upgrade()
         print('Database tables created.')
 
+    @app.cli.command('db-upgrade')
+    def db_upgrade():
+        """Apply pending schema migrations to an existing database."""
+        from app.migrations import upgrade
+        ran = upgrade()
+        for name in ran:
+            print(f'Applied {name}')
+        print(f'Database is up to date ({len(ran)} migrations applied).')
+
+    @app.cli.command('stats-backfill')
+    def stats_backfill():
+        """Rebuild the daily stats rollups from sent_messages."""
+        from app.stats.rollup import backfill
+        buckets = backfill()
+        print(f'Rebuilt {buckets} daily_stats buckets.')
+
+    @app.cli.command('archive-sent-messages')
+    @click.option('--months', type=int, default=None,
+                  help='Keep this many months (default SENT_MESSAGES_RETENTION_MONTHS).')
+    @click.option('--dir', 'directory', default=None,
+                  help='Where to write the archives (default ARCHIVE_DIR).')
+    def archive_sent_messages(months, directory):
+        """Archive old sent_messages months to gzip JSONL and drop them."""
+        from datetime import datetime
+        from app.retention import add_months, archive, month_start
+        months = months if months is not None else app.config['SENT_MESSAGES_RETENTION_MONTHS']
+        directory = directory or app.config['ARCHIVE_DIR']
+        before = add_months(month_start(datetime.utcnow()), -months)
+        archived = archive(before, directory)
+        for month, rows in archived:
+            print(f'Archived {month:%Y-%m}: {rows} rows')
+        print(f'Archived {len(archived)} months before {before:%Y-%m} to {directory}.')
+
+    @app.cli.command('export-responses')
+    @click.argument('email')
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default='csv')
+    @click.option('--message', 'message_id', default=None, help='Only this message id.')
+    @click.option('--since', type=click.DateTime(), default=None, help='Sent at or after.')
+    @click.option('--until', type=click.DateTime(), default=None, help='Sent before.')
+    @click.option('--status', type=click.Choice(['sent', 'responded', 'failed']), default=None)
+    @click.option('--output', type=click.File('w'), default='-', help='Output file (default stdout).')
+    def export_responses(email, fmt, message_id, since, until, status, output):
+        """Export a user's send/response history as CSV or JSONL."""
+        from app.stats.export import encode, export_rows
+        user = User.query.filter_by(email=email).first()
+        if not user:
+            print(f'User {email} not found.')
+            return
+        rows = export_rows(
+            user.id, message_id=uuid.UUID(message_id) if message_id else None,
+            since=since, until=until, status=status,
+        )
+        for chunk in encode(rows, fmt):
+            output.write(chunk)
+
     @app.cli.command('register-webhook')
     def register_webhook():
         """Register the Telegram webhook URL."""
-        import requests
-        token = app.config['TELEGRAM_BOT_TOKEN']
         url = f"{app.config['APP_URL']}/webhook/telegram"
         secret = app.config['TELEGRAM_WEBHOOK_SECRET']
-        resp = requests.post(
-            f"https://api.telegram.org/bot{token}/setWebhook",
-            json={'url': url, 'secret_token': secret}
-        )
-        data = resp.json()
+        data = telegram.call('setWebhook', {'url': url, 'secret_token': secret})
         if data.get('ok'):
             print(f'Webhook registered: {url}')
         else:
             print(f'Error: {data}')
 
+    @app.cli.command('poll-updates')
+    @click.option('--timeout', type=int, default=20, help='Long-poll timeout in seconds.')
+    @click.option('--once', is_flag=True, help='Process one batch and exit.')
+    def poll_updates(timeout, once):
+        """Receive updates with getUpdates long polling instead of the webhook."""
+        from app.telegram.polling import UpdatePoller
+        # Replies are queued; send them from this process too
+        outbox.dispatcher.init_app(app)
+        poller = UpdatePoller(app, timeout=timeout)
+        poller.start()
+        print('Polling for updates (webhook removed).')
+        count = poller.run(once=once)
+        print(f'Processed {count} updates.')
+
     @app.cli.command('test-send')
     @click.argument('user_id')
     def test_send(user_id):
@@ -83,3 +172,9 @@ def create_app():
         print(f'Test message sent to {user.email}.')
 
     return app
+
+
+def _serving():
+    """True unless the app is being loaded for a ``flask`` CLI command."""
+    ctx = click.get_current_context(silent=True)
+    return ctx is None or ctx.info_name == 'run'
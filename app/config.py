@@ -9,4 +9,71 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', '')
     TELEGRAM_WEBHOOK_SECRET = os.environ.get('TELEGRAM_WEBHOOK_SECRET', '')
+    TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+    # Bot API pacing: messages/s across the bot, and per chat
+    TELEGRAM_GLOBAL_RATE = float(os.environ.get('TELEGRAM_GLOBAL_RATE', 30))
+    TELEGRAM_CHAT_RATE = float(os.environ.get('TELEGRAM_CHAT_RATE', 1))
+    # Processes sharing the bot token (workers x replicas); each one gets an
+    # equal share of the two rates above
+    TELEGRAM_RATE_PROCESSES = int(os.environ.get(
+        'TELEGRAM_RATE_PROCESSES', os.environ.get('GUNICORN_WORKERS', 1)
+    ))
+    # Keep-alive connections held open to the Bot API
+    TELEGRAM_POOL_SIZE = int(os.environ.get('TELEGRAM_POOL_SIZE', 16))
     APP_URL = os.environ.get('APP_URL', 'http://localhost:5000')
+
+    # JSON library for API responses and Bot API calls: "auto" uses orjson
+    # when installed, "stdlib" always uses the json module
+    JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto')
+
+    # Off: don't start the scheduler, outbox and inbox threads in this process
+    # (they never start for CLI commands other than `flask run`)
+    BACKGROUND_JOBS = os.environ.get('BACKGROUND_JOBS', '1') == '1'
+
+    # Number of due schedules sent in parallel per scheduler tick (1 = serial).
+    # Serial by default on SQLite, which allows only one writer at a time
+    SCHEDULER_CONCURRENCY = int(os.environ.get(
+        'SCHEDULER_CONCURRENCY', 1 if SQLALCHEMY_DATABASE_URI.startswith('sqlite') else 8
+    ))
+    # Seconds a scheduler leader holds its lease without renewing it
+    SCHEDULER_LEASE_SECONDS = int(os.environ.get('SCHEDULER_LEASE_SECONDS', 30))
+    # Longest the dispatcher sleeps between wakeups, and how many upcoming
+    # run times it keeps in memory
+    SCHEDULER_MAX_SLEEP_SECONDS = int(os.environ.get('SCHEDULER_MAX_SLEEP_SECONDS', 60))
+    SCHEDULER_PREFETCH = int(os.environ.get('SCHEDULER_PREFETCH', 500))
+    # Off: every process claims and sends due schedules instead of just the leader
+    SCHEDULER_LEADER_ELECTION = os.environ.get('SCHEDULER_LEADER_ELECTION', '1') == '1'
+    # Due schedules claimed per batch, and how long a claim lasts before expiring
+    SCHEDULER_CLAIM_BATCH = int(os.environ.get('SCHEDULER_CLAIM_BATCH', 100))
+    SCHEDULER_CLAIM_LEASE_SECONDS = int(os.environ.get('SCHEDULER_CLAIM_LEASE_SECONDS', 300))
+
+    # Bearer token for the /metrics endpoint (disabled when empty)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+    # Outbound Bot API queue used by the webhook
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 50))
+    OUTBOX_POLL_SECONDS = float(os.environ.get('OUTBOX_POLL_SECONDS', 5))
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 5))
+
+    # Webhook ingestion: store updates in the inbound_updates table and ack
+    # at once, processing them in batches in the background
+    TELEGRAM_WEBHOOK_INBOX = os.environ.get('TELEGRAM_WEBHOOK_INBOX', '0') == '1'
+    INBOX_BATCH_SIZE = int(os.environ.get('INBOX_BATCH_SIZE', 100))
+    INBOX_POLL_SECONDS = float(os.environ.get('INBOX_POLL_SECONDS', 5))
+    INBOX_MAX_ATTEMPTS = int(os.environ.get('INBOX_MAX_ATTEMPTS', 5))
+
+    # Per-process index of unanswered sends used to check button presses
+    # without a lookup: entry lifetime and maximum size
+    PENDING_INDEX_TTL = int(os.environ.get('PENDING_INDEX_TTL', 86400))
+    PENDING_INDEX_SIZE = int(os.environ.get('PENDING_INDEX_SIZE', 100000))
+
+    # Stats/dashboard cache: entry lifetime, size, and an optional
+    # "module:factory" returning a shared backend (e.g. Redis-backed)
+    STATS_CACHE_TTL = int(os.environ.get('STATS_CACHE_TTL', 300))
+    STATS_CACHE_SIZE = int(os.environ.get('STATS_CACHE_SIZE', 10000))
+    STATS_CACHE_BACKEND = os.environ.get('STATS_CACHE_BACKEND', '')
+
+    # Months of sent_messages kept in the database; older months are moved
+    # to ARCHIVE_DIR by `flask archive-sent-messages`
+    SENT_MESSAGES_RETENTION_MONTHS = int(os.environ.get('SENT_MESSAGES_RETENTION_MONTHS', 12))
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'archive')
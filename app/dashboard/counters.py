@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, func
+
+from app.extensions import db
+from app.models import Message, SentMessage, DailyStat
+from app.stats.cache import stats_cache
+from app.stats.rollup import since_filter
+
+
+def get_dashboard_data(user):
+    """Counters and recent activity for the dashboard, cached per user.
+
+    Cached under the user's ``stats_version``, so a send, response or
+    message change shows up on the next page load.
+    """
+    return stats_cache.get_or_load(
+        stats_cache.key(user, 'dashboard'), lambda: _load(user.id)
+    )
+
+
+def _load(user_id):
+    now = datetime.utcnow()
+    today = now.date()
+    in_last_7d = since_filter(now - timedelta(days=7))
+
+    active_messages = (
+        db.select(func.count(Message.id))
+        .where(Message.user_id == user_id, Message.is_active.is_(True))
+        .scalar_subquery()
+    )
+
+    # All counters in one round-trip over the rollup
+    active, sent_today, total_7d, responded_7d, pending = (
+        db.session.query(
+            active_messages,
+            func.coalesce(func.sum(case((DailyStat.day == today, DailyStat.sent_count), else_=0)), 0),
+            func.coalesce(func.sum(case((in_last_7d, DailyStat.sent_count), else_=0)), 0),
+            func.coalesce(func.sum(case((in_last_7d, DailyStat.responded_count), else_=0)), 0),
+            func.coalesce(func.sum(DailyStat.sent_count - DailyStat.responded_count), 0),
+        )
+        .select_from(DailyStat)
+        .filter(DailyStat.user_id == user_id)
+        .one()
+    )
+    response_rate = round((responded_7d / total_7d * 100), 1) if total_7d > 0 else 0
+
+    recent = (
+        db.session.query(
+            SentMessage.message_id,
+            Message.title,
+            SentMessage.sent_at,
+            SentMessage.response,
+            SentMessage.status,
+        )
+        .join(Message, SentMessage.message_id == Message.id)
+        .filter(SentMessage.user_id == user_id)
+        .order_by(SentMessage.sent_at.desc())
+        .limit(10)
+        .all()
+    )
+
+    return {
+        'active_messages': active,
+        'sent_today': sent_today,
+        'response_rate': response_rate,
+        'pending': pending,
+        'recent': recent,
+    }
@@ -0,0 +1,65 @@
+"""JSON encoding for Flask responses/requests and Bot API traffic.
+
+Uses orjson when it is installed (``pip install orjson``) and the standard
+library otherwise; ``JSON_BACKEND=stdlib`` forces the fallback. The
+output is valid JSON either way. orjson writes non-ASCII characters as
+UTF-8 instead of ``\\uXXXX`` escapes.
+"""
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+# The library in use; switched to the stdlib by init_app if configured
+_orjson = orjson
+
+
+def dumps(obj):
+    """Serialise ``obj`` to a compact JSON string."""
+    if _orjson:
+        return _orjson.dumps(obj, option=_orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, separators=(',', ':'))
+
+
+def loads(data):
+    """Parse JSON from ``str`` or UTF-8 ``bytes``."""
+    if _orjson:
+        return _orjson.loads(data)
+    return json.loads(data)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson.
+
+    Keeps Flask's handling of dates (HTTP date strings), decimals and
+    dataclasses by routing them through ``DefaultJSONProvider.default``.
+    Calls with arguments orjson has no equivalent for fall back to the
+    stdlib implementation.
+    """
+
+    def dumps(self, obj, **kwargs):
+        indent = kwargs.get('indent')
+        if set(kwargs) - {'indent', 'separators'} or indent not in (None, 2):
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+def init_app(app):
+    global _orjson
+    _orjson = orjson if app.config.get('JSON_BACKEND', 'auto') != 'stdlib' else None
+    if _orjson:
+        app.json = OrjsonProvider(app)
@@ -1,23 +1,42 @@
 import uuid
-from flask import render_template, redirect, url_for, flash, request, jsonify
+from flask import render_template, redirect, url_for, flash, request, jsonify, abort
 from flask_login import login_required, current_user
 
 from app.messages import messages_bp
 from app.messages.forms import MessageForm
 from app.extensions import db
 from app.models import Message, SentMessage
+from app.pagination import keyset_page
+from app.scheduler.wakeup import planner
+from app.stats.rollup import bump_stats_version
+from app.telegram.payloads import payload_cache
+
+
+PAGE_SIZE = 50
+
+
+def _page(query, sort_column, id_column):
+    try:
+        return keyset_page(
+            query, sort_column, id_column,
+            after=request.args.get('after'), per_page=PAGE_SIZE,
+        )
+    except ValueError:
+        abort(400)
 
 
 @messages_bp.route('/')
 @login_required
 def list_messages():
-    messages = (
-        Message.query
-        .filter_by(user_id=current_user.id)
-        .order_by(Message.created_at.desc())
-        .all()
+    messages, next_cursor = _page(
+        Message.query.filter_by(user_id=current_user.id), Message.created_at, Message.id
     )
-    return render_template('messages/list.html', messages=messages)
+    if request.headers.get('HX-Request') and request.args.get('after'):
+        # "Load more": just the next rows
+        return render_template(
+            'messages/_message_rows.html', messages=messages, next_cursor=next_cursor
+        )
+    return render_template('messages/list.html', messages=messages, next_cursor=next_cursor)
 
 
 @messages_bp.route('/new', methods=['GET', 'POST'])
@@ -39,6 +58,7 @@ def create():
             custom_options=custom_opts,
         )
         db.session.add(msg)
+        bump_stats_version(current_user.id)
         db.session.commit()
         flash('Message created.', 'success')
         return redirect(url_for('messages.detail', message_id=msg.id))
@@ -54,16 +74,28 @@ def detail(message_id):
     ).first_or_404()
 
     schedules = msg.schedules.order_by(None).all()
-    history = (
-        SentMessage.query
-        .filter_by(message_id=msg.id)
-        .order_by(SentMessage.sent_at.desc())
-        .limit(50)
-        .all()
+    history, next_cursor = _page(
+        SentMessage.query.filter_by(message_id=msg.id), SentMessage.sent_at, SentMessage.id
     )
 
     return render_template(
-        'messages/detail.html', message=msg, schedules=schedules, history=history
+        'messages/detail.html', message=msg, schedules=schedules,
+        history=history, next_cursor=next_cursor,
+    )
+
+
+@messages_bp.route('/<message_id>/history')
+@login_required
+def history(message_id):
+    """Next page of a message's send history (HTMX "load more")."""
+    msg = Message.query.filter_by(
+        id=uuid.UUID(message_id), user_id=current_user.id
+    ).first_or_404()
+    history, next_cursor = _page(
+        SentMessage.query.filter_by(message_id=msg.id), SentMessage.sent_at, SentMessage.id
+    )
+    return render_template(
+        'messages/_history_rows.html', message=msg, history=history, next_cursor=next_cursor
     )
 
 
@@ -88,7 +120,9 @@ def edit(message_id):
             ]
         else:
             msg.custom_options = None
+        bump_stats_version(current_user.id)  # titles appear in stats
         db.session.commit()
+        payload_cache.invalidate(msg.id)
         flash('Message updated.', 'success')
         return redirect(url_for('messages.detail', message_id=msg.id))
 
@@ -102,7 +136,11 @@ def toggle(message_id):
         id=uuid.UUID(message_id), user_id=current_user.id
     ).first_or_404()
     msg.is_active = not msg.is_active
+    bump_stats_version(current_user.id)
     db.session.commit()
+    if msg.is_active:
+        # Its schedules may be overdue while the message was paused
+        planner.wake_now()
 
     if request.headers.get('HX-Request'):
         return render_template('messages/_message_row.html', msg=msg)
@@ -118,6 +156,7 @@ def delete(message_id):
         id=uuid.UUID(message_id), user_id=current_user.id
     ).first_or_404()
     db.session.delete(msg)
+    bump_stats_version(current_user.id)
     db.session.commit()
 
     if request.headers.get('HX-Request'):
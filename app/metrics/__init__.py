@@ -0,0 +1,14 @@
+from flask import Blueprint
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# name -> zero-argument callable returning a JSON-serialisable dict
+_sources = {}
+
+
+def register_source(name, func):
+    """Expose ``func()`` under ``name`` in the /metrics payload."""
+    _sources[name] = func
+
+
+from app.metrics import routes  # noqa: E402, F401
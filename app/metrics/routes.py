@@ -0,0 +1,15 @@
+from flask import request, jsonify, current_app, abort
+
+from app.metrics import metrics_bp, _sources
+
+
+@metrics_bp.route('/metrics')
+def index():
+    """Operational counters for this process, guarded by METRICS_TOKEN."""
+    token = current_app.config.get('METRICS_TOKEN')
+    if not token:
+        abort(404)
+    if request.headers.get('Authorization', '') != f'Bearer {token}':
+        return jsonify({"error": "unauthorized"}), 403
+
+    return jsonify({name: func() for name, func in _sources.items()})
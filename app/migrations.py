@@ -0,0 +1,111 @@
+"""Forward-only schema migrations, applied in order by ``flask db-upgrade``."""
+from sqlalchemy import inspect, text
+
+from app import retention
+from app.extensions import db
+from app.models import SchemaMigration, ShortIdCounter
+from app.stats import rollup
+
+
+def _columns(table):
+    return {col['name'] for col in inspect(db.session.connection()).get_columns(table)}
+
+
+def _add_column(table, column, ddl):
+    if column not in _columns(table):
+        db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+
+def _create_indexes(table):
+    """Create the indexes declared on the model for ``table`` that are missing."""
+    existing = {ix['name'] for ix in inspect(db.session.connection()).get_indexes(table)}
+    for index in db.metadata.tables[table].indexes:
+        if index.name not in existing:
+            index.create(db.session.connection())
+
+
+def schedule_claims():
+    _add_column('schedules', 'claimed_by', 'VARCHAR(32)')
+    _add_column('schedules', 'claimed_until', 'TIMESTAMP')
+    _create_indexes('schedules')
+
+
+def short_id_sequence():
+    if db.engine.dialect.name != 'postgresql':
+        return  # SQLite allocates short ids from short_id_counter (0007)
+    db.session.execute(text('CREATE SEQUENCE IF NOT EXISTS sent_messages_short_id_seq'))
+    db.session.execute(text(
+        "SELECT setval('sent_messages_short_id_seq', "
+        "(SELECT COALESCE(MAX(short_id), 0) + 1 FROM sent_messages), false)"
+    ))
+
+
+def user_stats_version():
+    _add_column('users', 'stats_version', 'INTEGER NOT NULL DEFAULT 0')
+
+
+def sent_message_indexes():
+    _create_indexes('sent_messages')
+    _create_indexes('outbound_actions')
+
+
+def partition_sent_messages():
+    if db.engine.dialect.name != 'postgresql' or retention.is_partitioned():
+        return
+    retention.partition_sent_messages()
+    _create_indexes('sent_messages')
+
+
+def message_indexes():
+    _create_indexes('messages')
+
+
+def short_id_counter():
+    if db.engine.dialect.name == 'postgresql':
+        return  # short ids come from sent_messages_short_id_seq
+    if db.session.get(ShortIdCounter, 1) is None:
+        start = db.session.execute(text('SELECT COALESCE(MAX(short_id), 0) FROM sent_messages')).scalar()
+        db.session.add(ShortIdCounter(id=1, value=start))
+
+
+def drop_sent_message_user_status_index():
+    # Pending counts come from the rollups; nothing reads this index
+    db.session.execute(text('DROP INDEX IF EXISTS ix_sent_messages_user_status'))
+
+
+def stats_rollups():
+    """Fill the rollups for sends made before they existed."""
+    rollup.backfill()
+    db.session.execute(text('UPDATE users SET stats_version = stats_version + 1'))
+
+
+# (id, function), applied in this order. Append only; never rename ids.
+MIGRATIONS = [
+    ('0001_schedule_claims', schedule_claims),
+    ('0002_short_id_sequence', short_id_sequence),
+    ('0003_user_stats_version', user_stats_version),
+    ('0004_sent_message_indexes', sent_message_indexes),
+    ('0005_partition_sent_messages', partition_sent_messages),
+    ('0006_message_indexes', message_indexes),
+    ('0007_short_id_counter', short_id_counter),
+    ('0008_stats_rollups', stats_rollups),
+    ('0009_drop_sent_message_user_status_index', drop_sent_message_user_status_index),
+]
+
+
+def pending():
+    applied = set(db.session.scalars(db.select(SchemaMigration.id)))
+    return [(name, func) for name, func in MIGRATIONS if name not in applied]
+
+
+def upgrade():
+    """Bring the schema up to date. Returns the ids of the migrations run."""
+    db.create_all()
+    ran = []
+    for name, func in pending():
+        func()
+        db.session.add(SchemaMigration(id=name))
+        db.session.commit()
+        ran.append(name)
+    return ran
+
@@ -45,6 +45,8 @@ class User(UserMixin, db.Model):
     linking_code = db.Column(db.String(10), nullable=True)
     linking_code_expires = db.Column(db.DateTime, nullable=True)
     timezone = db.Column(db.String(50), default='UTC')
+    # Bumped whenever the user's stats change; part of every stats cache key
+    stats_version = db.Column(db.Integer, nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     messages = db.relationship('Message', backref='user', lazy='dynamic')
@@ -75,6 +77,10 @@ class Message(db.Model):
         'SentMessage', backref='message', lazy='dynamic'
     )
 
+    __table_args__ = (
+        db.Index('ix_messages_user_created', 'user_id', 'created_at'),
+    )
+
 
 class Schedule(db.Model):
     __tablename__ = 'schedules'
@@ -88,6 +94,9 @@ class Schedule(db.Model):
     timezone = db.Column(db.String(50), default='UTC')
     is_active = db.Column(db.Boolean, default=True)
     next_run_at = db.Column(db.DateTime, nullable=True)
+    # Set while a scheduler worker owns this schedule's current run
+    claimed_by = db.Column(db.String(32), nullable=True)
+    claimed_until = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     sent_messages = db.relationship('SentMessage', backref='schedule', lazy='dynamic')
@@ -101,7 +110,7 @@ class SentMessage(db.Model):
     __tablename__ = 'sent_messages'
 
     id = db.Column(FlexibleUUID(), primary_key=True, default=uuid.uuid4)
-    short_id = db.Column(db.Integer, autoincrement=True, unique=True)
+    short_id = db.Column(db.Integer, db.Sequence('sent_messages_short_id_seq'), unique=True)
     message_id = db.Column(FlexibleUUID(), db.ForeignKey('messages.id'), nullable=False)
     schedule_id = db.Column(FlexibleUUID(), db.ForeignKey('schedules.id'), nullable=True)
     user_id = db.Column(FlexibleUUID(), db.ForeignKey('users.id'), nullable=False)
@@ -113,4 +122,107 @@ class SentMessage(db.Model):
 
     __table_args__ = (
         db.Index('ix_sent_messages_user_sent', 'user_id', 'sent_at'),
+        # Message history and the response heatmap
+        db.Index('ix_sent_messages_message_sent', 'message_id', 'sent_at'),
+        db.Index('ix_sent_messages_user_responded', 'user_id', 'responded_at'),
+    )
+
+
+class ShortIdCounter(db.Model):
+    """Last short_id handed out on SQLite, which has no sequences.
+
+    Deleting (archiving) sent_messages rows can lower ``MAX(short_id)``, but
+    never this, so short_ids still on old Telegram buttons are not reused.
+    """
+    __tablename__ = 'short_id_counter'
+
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
+class OutboundAction(db.Model):
+    """A queued Bot API call, drained by app.telegram.outbox."""
+    __tablename__ = 'outbound_actions'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    method = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(20), default='pending')  # pending, sending, failed
+    attempts = db.Column(db.Integer, default=0)
+    claimed_by = db.Column(db.String(32), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_outbound_actions_status_next', 'status', 'next_attempt_at'),
+    )
+
+
+class InboundUpdate(db.Model):
+    """A raw Telegram update waiting to be processed by app.telegram.inbox."""
+    __tablename__ = 'inbound_updates'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    update_id = db.Column(db.BigInteger, unique=True, nullable=True)
+    payload = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(20), default='pending')  # pending, processing, failed
+    attempts = db.Column(db.Integer, default=0)
+    claimed_by = db.Column(db.String(32), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_inbound_updates_status_next', 'status', 'next_attempt_at'),
+    )
+
+
+class SchemaMigration(db.Model):
+    """A schema change from app.migrations that has been applied."""
+    __tablename__ = 'schema_migrations'
+
+    id = db.Column(db.String(100), primary_key=True)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SchedulerLease(db.Model):
+    """Lease row naming the process that currently drives a scheduler job."""
+    __tablename__ = 'scheduler_leases'
+
+    name = db.Column(db.String(50), primary_key=True)
+    owner = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    heartbeat_at = db.Column(db.DateTime, nullable=False)
+
+
+class DailyStat(db.Model):
+    """Per-hour rollup of sends and responses, bucketed by ``sent_at`` (UTC).
+
+    Maintained incrementally by app.stats.rollup; rebuild with
+    ``flask stats-backfill``.
+    """
+    __tablename__ = 'daily_stats'
+
+    user_id = db.Column(FlexibleUUID(), db.ForeignKey('users.id'), primary_key=True)
+    message_id = db.Column(
+        FlexibleUUID(), db.ForeignKey('messages.id', ondelete='CASCADE'), primary_key=True
+    )
+    day = db.Column(db.Date, primary_key=True)
+    hour = db.Column(db.Integer, primary_key=True)
+    sent_count = db.Column(db.Integer, nullable=False, default=0)
+    responded_count = db.Column(db.Integer, nullable=False, default=0)
+    response_seconds = db.Column(db.Float, nullable=False, default=0)
+
+
+class DailyResponseStat(db.Model):
+    """Per-day histogram of response values, bucketed by ``sent_at`` (UTC)."""
+    __tablename__ = 'daily_response_stats'
+
+    user_id = db.Column(FlexibleUUID(), db.ForeignKey('users.id'), primary_key=True)
+    message_id = db.Column(
+        FlexibleUUID(), db.ForeignKey('messages.id', ondelete='CASCADE'), primary_key=True
     )
+    day = db.Column(db.Date, primary_key=True)
+    response = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
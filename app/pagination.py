@@ -0,0 +1,38 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(sort_value, row_id):
+    return f'{sort_value.isoformat()}_{row_id}'
+
+
+def decode_cursor(cursor):
+    """Inverse of ``encode_cursor``. Raises ``ValueError`` for malformed cursors."""
+    sort_value, _, row_id = cursor.partition('_')
+    return datetime.fromisoformat(sort_value), uuid.UUID(row_id)
+
+
+def keyset_page(query, sort_column, id_column, after=None, per_page=50):
+    """One page of ``query``, newest first, ordered by ``(sort_column, id_column)``.
+
+    ``after`` is the cursor returned with the previous page. Each page
+    seeks straight past the last row seen instead of using OFFSET, so
+    deep pages cost the same as the first one. Returns ``(items,
+    next_cursor)``; ``next_cursor`` is ``None`` on the last page.
+    """
+    if after:
+        sort_value, row_id = decode_cursor(after)
+        # The redundant ``<=`` gives the index a range to seek to
+        query = query.filter(
+            sort_column <= sort_value,
+            or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < row_id)),
+        )
+    items = query.order_by(sort_column.desc(), id_column.desc()).limit(per_page + 1).all()
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return items, next_cursor
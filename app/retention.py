@@ -0,0 +1,162 @@
+"""Monthly partitions (PostgreSQL) and archival of sent_messages.
+
+Archived months stay in the daily rollups, so dashboards and stats still count them.
+"""
+import gzip
+import json
+import os
+from datetime import date, datetime
+
+from sqlalchemy import delete, func, select, text
+
+from app.extensions import db
+from app.models import SentMessage
+
+
+def _is_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'sent_messages_{month:%Y_%m}'
+
+
+def is_partitioned():
+    if not _is_postgres():
+        return False
+    return db.session.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+        "WHERE partrelid = 'sent_messages'::regclass)"
+    )).scalar()
+
+
+def ensure_partitions(since=None, months_ahead=2):
+    """Create monthly partitions from ``since`` (default: this month) to
+    ``months_ahead`` months from now. Returns the names created."""
+    if not is_partitioned():
+        return []
+    created = _create_partitions(since, months_ahead)
+    db.session.commit()
+    return created
+
+
+def _create_partitions(since, months_ahead):
+    today = datetime.utcnow().date()
+    month = month_start(since or today)
+    last = add_months(month_start(today), months_ahead)
+    created = []
+    while month <= last:
+        name = partition_name(month)
+        exists = db.session.execute(
+            text('SELECT to_regclass(:name) IS NOT NULL'), {'name': name}
+        ).scalar()
+        if not exists:
+            db.session.execute(text(
+                f"CREATE TABLE {name} PARTITION OF sent_messages "
+                f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+            ))
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+def partition_sent_messages():
+    """Turn an existing plain ``sent_messages`` table into a partitioned one.
+
+    Rows are copied into monthly partitions in one transaction. The primary
+    key and the short_id constraint have to include ``sent_at`` on a
+    partitioned table; short_ids stay unique through their sequence.
+    """
+    db.session.execute(text('ALTER TABLE sent_messages RENAME TO sent_messages_unpartitioned'))
+    db.session.execute(text(
+        'CREATE TABLE sent_messages (LIKE sent_messages_unpartitioned INCLUDING DEFAULTS) '
+        'PARTITION BY RANGE (sent_at)'
+    ))
+    for ddl in (
+        'ADD PRIMARY KEY (id, sent_at)',
+        'ADD UNIQUE (short_id, sent_at)',
+        'ADD FOREIGN KEY (message_id) REFERENCES messages (id)',
+        'ADD FOREIGN KEY (schedule_id) REFERENCES schedules (id)',
+        'ADD FOREIGN KEY (user_id) REFERENCES users (id)',
+    ):
+        db.session.execute(text(f'ALTER TABLE sent_messages {ddl}'))
+    db.session.execute(text('CREATE TABLE sent_messages_default PARTITION OF sent_messages DEFAULT'))
+
+    oldest = db.session.execute(text('SELECT MIN(sent_at) FROM sent_messages_unpartitioned')).scalar()
+    _create_partitions(oldest, months_ahead=2)
+
+    db.session.execute(text('INSERT INTO sent_messages SELECT * FROM sent_messages_unpartitioned'))
+    db.session.execute(text('DROP TABLE sent_messages_unpartitioned'))
+
+
+def archive(before, directory, batch_size=5000):
+    """Archive and remove every whole month of sent_messages before ``before``.
+
+    Each month is written to ``<directory>/sent_messages_YYYY_MM.jsonl.gz``
+    and only then dropped (its partition on PostgreSQL, its rows on
+    SQLite), one month per transaction. Months without rows get no file.
+    Returns ``[(month, rows)]`` for the months written.
+    """
+    cutoff = month_start(before)
+    oldest = db.session.query(func.min(SentMessage.sent_at)).scalar()
+    if oldest is None:
+        return []
+    os.makedirs(directory, exist_ok=True)
+    partitioned = is_partitioned()
+    archived = []
+    month = month_start(oldest)
+    while month < cutoff:
+        end = add_months(month, 1)
+        path = os.path.join(directory, f'{partition_name(month)}.jsonl.gz')
+        rows = _export(path, month, end, batch_size)
+        if partitioned:
+            db.session.execute(text(f'DROP TABLE IF EXISTS {partition_name(month)}'))
+        # Also catches rows that landed in the default partition
+        db.session.execute(
+            delete(SentMessage)
+            .where(SentMessage.sent_at >= month, SentMessage.sent_at < end)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if rows:
+            archived.append((month, rows))
+        month = end
+    return archived
+
+
+def _export(path, start, end, batch_size):
+    """Write the month's rows to ``path`` (via a temp file). Returns the row
+    count; nothing is left behind for an empty month."""
+    columns = SentMessage.__table__.columns
+    query = (
+        select(*columns)
+        .where(SentMessage.sent_at >= start, SentMessage.sent_at < end)
+        .order_by(SentMessage.sent_at)
+        .execution_options(yield_per=batch_size)
+    )
+    count = 0
+    tmp_path = path + '.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        for row in db.session.execute(query):
+            f.write(json.dumps(dict(row._mapping), default=_encode) + '\n')
+            count += 1
+    if count:
+        os.replace(tmp_path, path)
+    else:
+        os.remove(tmp_path)
+    return count
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
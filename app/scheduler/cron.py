@@ -0,0 +1,54 @@
+import copy
+from datetime import datetime
+from functools import lru_cache
+
+import pytz
+from croniter import croniter
+
+
+@lru_cache(maxsize=512)
+def get_timezone(name):
+    """Cached ``pytz.timezone`` lookup."""
+    return pytz.timezone(name)
+
+
+@lru_cache(maxsize=4096)
+def compile_cron(cron_expression):
+    """Parse a cron expression once and cache the result.
+
+    Raises the same errors as ``croniter`` for invalid expressions (errors
+    are not cached). The returned object is a shared template: copy it
+    before iterating, as ``next_run`` does.
+    """
+    return croniter(cron_expression)
+
+
+def next_run(cron_expression, timezone_str='UTC', now=None):
+    """Next run time of ``cron_expression`` in ``timezone_str`` after ``now``.
+
+    ``now`` and the result are naive UTC datetimes, matching how
+    ``Schedule.next_run_at`` is stored.
+    """
+    tz = get_timezone(timezone_str)
+    local_now = pytz.utc.localize(now or datetime.utcnow()).astimezone(tz)
+    cron = copy.copy(compile_cron(cron_expression))
+    cron.set_current(local_now, force=True)
+    next_local = cron.get_next(datetime)
+    return next_local.astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def next_runs(pairs, now=None):
+    """Compute next runs for many ``(cron_expression, timezone)`` pairs at once.
+
+    Schedules often share expressions and timezones, so each distinct pair
+    is computed once. Returns ``{pair: next_run}``; invalid pairs map to
+    ``None``.
+    """
+    now = now or datetime.utcnow()
+    results = {}
+    for pair in set(pairs):
+        try:
+            results[pair] = next_run(pair[0], pair[1], now)
+        except Exception:
+            results[pair] = None
+    return results
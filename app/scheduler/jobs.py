@@ -1,93 +1,290 @@
-from apscheduler.schedulers.background import BackgroundScheduler
-from croniter import croniter
-from datetime import datetime
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
-import pytz
+from apscheduler.schedulers.background import BackgroundScheduler
+from sqlalchemy import delete, insert, or_, text, update
+from sqlalchemy.exc import IntegrityError
 
 from app.extensions import db
-from app.models import Schedule, Message, User, SentMessage
+from app.models import Schedule, Message, User, SentMessage, ShortIdCounter
+from app.retention import ensure_partitions
+from app.scheduler.cron import next_run, next_runs
+from app.scheduler.leader import leader
+from app.scheduler.wakeup import planner
+from app.stats.rollup import record_sent
 from app.telegram.bot import send_scheduled_message
+from app.telegram.pending import pending_index
 
 scheduler = BackgroundScheduler()
 
 
 def init_scheduler(app):
-    """Add the main job and start the scheduler."""
+    """Add the scheduler jobs and start the scheduler (sends only on the lease holder)."""
+    leader.init_app(app)
+    planner.init_app(app, scheduler, run_due_messages, 'process_due_messages')
     scheduler.add_job(
-        func=process_due_messages,
+        func=_heartbeat,
         trigger='interval',
-        seconds=60,
-        id='process_due_messages',
+        seconds=max(1, leader.lease_seconds // 3),
+        id='leader_heartbeat',
         kwargs={'app': app},
+        next_run_time=datetime.now(),
         replace_existing=True,
     )
+    scheduler.add_job(
+        func=_maintain_partitions,
+        trigger='interval',
+        hours=12,
+        id='sent_messages_partitions',
+        kwargs={'app': app},
+        replace_existing=True,
+    )
+    planner.arm(idle=True)
     scheduler.start()
 
 
-def process_due_messages(app):
-    """Find all due schedules and send their messages."""
+def _heartbeat(app):
+    was_leader = leader.is_leader
+    if leader.heartbeat(app) and not was_leader:
+        # Just took over: catch up on anything due right away
+        planner.wake_now()
+
+
+def _maintain_partitions(app):
+    """Keep sent_messages partitions created ahead of time (leader only)."""
+    if not leader.is_leader:
+        return
     with app.app_context():
-        now = datetime.utcnow()
-
-        due_schedules = (
-            Schedule.query
-            .filter(Schedule.is_active.is_(True), Schedule.next_run_at <= now)
-            .join(Message)
-            .filter(Message.is_active.is_(True))
-            .join(User)
-            .filter(User.bot_linked.is_(True))
-            .all()
+        try:
+            ensure_partitions()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error creating sent_messages partitions: {e}")
+
+
+def run_due_messages(app):
+    """Scheduler entry point: send what is due, then re-arm for the next wakeup."""
+    sending = leader.is_leader or not app.config.get('SCHEDULER_LEADER_ELECTION', True)
+    try:
+        if sending:
+            with app.app_context():
+                planner.refill()
+            if planner.has_due():
+                process_due_messages(app)
+                with app.app_context():
+                    planner.refill()
+    except Exception as e:
+        print(f"Scheduler run failed: {e}")
+    finally:
+        planner.arm(idle=not sending)
+
+
+def process_due_messages(app):
+    """Claim due schedules batch by batch and send their messages."""
+    concurrency = app.config.get('SCHEDULER_CONCURRENCY', 1)
+    batch_size = app.config.get('SCHEDULER_CLAIM_BATCH', 100)
+    lease_seconds = app.config.get('SCHEDULER_CLAIM_LEASE_SECONDS', 300)
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, concurrency), thread_name_prefix='dispatch'
+    ) as pool:
+        while True:
+            with app.app_context():
+                now = datetime.utcnow()
+                claimed_ids = claim_due_schedules(now, batch_size, lease_seconds)
+                if not claimed_ids:
+                    return
+                _dispatch_batch(app, claimed_ids, now, pool if concurrency > 1 else None)
+
+
+def claim_due_schedules(now, batch_size, lease_seconds):
+    """Atomically claim up to ``batch_size`` due schedules. Returns their ids."""
+    token = uuid.uuid4().hex
+    unclaimed = or_(Schedule.claimed_until.is_(None), Schedule.claimed_until < now)
+    due = (
+        db.select(Schedule.id)
+        .join(Message, Schedule.message_id == Message.id)
+        .join(User, Schedule.user_id == User.id)
+        .where(
+            Schedule.is_active.is_(True),
+            Schedule.next_run_at <= now,
+            unclaimed,
+            Message.is_active.is_(True),
+            User.bot_linked.is_(True),
         )
+        .order_by(Schedule.next_run_at)
+        .limit(batch_size)
+        .with_for_update(of=Schedule, skip_locked=True)
+    )
+    db.session.execute(
+        update(Schedule)
+        .where(Schedule.id.in_(due.scalar_subquery()), unclaimed)
+        .values(claimed_by=token, claimed_until=now + timedelta(seconds=lease_seconds))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return list(db.session.scalars(
+        db.select(Schedule.id).where(Schedule.claimed_by == token)
+    ))
 
-        for schedule in due_schedules:
-            try:
-                message = schedule.message
-                user = schedule.user
 
-                # Create sent_message record
-                sent = SentMessage(
-                    message_id=message.id,
-                    schedule_id=schedule.id,
-                    user_id=user.id,
-                    sent_at=now,
-                    status='sent',
-                )
-                db.session.add(sent)
-                db.session.flush()  # Get the short_id
+def _dispatch_batch(app, schedule_ids, now, pool=None):
+    """Send one claimed batch, then record the sends and release the claims."""
+    rows = (
+        db.session.query(Schedule, Message, User)
+        .join(Message, Schedule.message_id == Message.id)
+        .join(User, Schedule.user_id == User.id)
+        .filter(Schedule.id.in_(schedule_ids))
+        .all()
+    )
+    if not rows:
+        return
 
-                # Send via Telegram
-                tg_msg_id = send_scheduled_message(user, message, sent.short_id)
-                sent.telegram_message_id = tg_msg_id
+    # Detach the loaded objects before anything commits (which would expire
+    # them): sender threads only read their already-loaded attributes.
+    db.session.expunge_all()
 
-                # Update next_run_at
-                _update_next_run(schedule)
+    next_by_pair = next_runs(
+        (schedule.cron_expression, schedule.timezone) for schedule, _, _ in rows
+    )
+    schedule_updates = []
+    for schedule, _, _ in rows:
+        next_run_at = next_by_pair[(schedule.cron_expression, schedule.timezone)]
+        if next_run_at is None:
+            print(f"Invalid schedule {schedule.id}: {schedule.cron_expression!r} ({schedule.timezone})")
+        schedule_updates.append({
+            'id': schedule.id,
+            'next_run_at': next_run_at,
+            'claimed_by': None,
+            'claimed_until': None,
+        })
 
-                db.session.commit()
+    try:
+        sent_rows = _insert_sent_messages(rows, now)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error inserting sent messages: {e}")
+        _release_schedules(schedule_updates)
+        return
 
+    jobs = [
+        (schedule.id, user, message, sent['short_id'])
+        for (schedule, message, user), sent in zip(rows, sent_rows)
+    ]
+
+    def send(job):
+        with app.app_context():
+            try:
+                return send_scheduled_message(job[1], job[2], job[3]), None
             except Exception as e:
-                db.session.rollback()
-                # Mark as failed and still update next_run
-                try:
-                    _update_next_run(schedule)
-                    db.session.commit()
-                except Exception:
-                    db.session.rollback()
-                print(f"Error sending schedule {schedule.id}: {e}")
+                return None, e
+
+    results = list(pool.map(send, jobs)) if pool else [send(job) for job in jobs]
+
+    delivered, delivered_rows, failed_ids = [], [], []
+    for job, sent, (tg_msg_id, error) in zip(jobs, sent_rows, results):
+        if error is None:
+            delivered.append({'id': sent['id'], 'telegram_message_id': tg_msg_id})
+            delivered_rows.append(sent)
+        else:
+            failed_ids.append(sent['id'])
+            print(f"Error sending schedule {job[0]}: {error}")
+
+    try:
+        _record_sent_rows(delivered, failed_ids)
+        db.session.execute(update(Schedule), schedule_updates)
+        record_sent(delivered_rows)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error recording dispatch batch: {e}")
+        # Still advance next_run_at so the batch is not sent again once
+        # the claims expire
+        _release_schedules(schedule_updates, delivered, delivered_rows, failed_ids)
+        return
+
+    # Presses on these messages can now be checked without a lookup
+    for job, sent, (_, error) in zip(jobs, sent_rows, results):
+        if error is None:
+            pending_index.add(sent['short_id'], sent['user_id'], sent['message_id'], now, job[2])
+
+
+def _release_schedules(schedule_updates, delivered=(), delivered_rows=(), failed_ids=()):
+    """Fallback when a batch cannot be recorded: advance and release the
+    schedules, then store what was sent, each step in its own transaction."""
+    for step in (
+        lambda: db.session.execute(update(Schedule), schedule_updates),
+        lambda: _record_sent_rows(delivered, failed_ids),
+        lambda: record_sent(delivered_rows),
+    ):
+        try:
+            step()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error releasing dispatch batch: {e}")
+
+
+def _record_sent_rows(delivered, failed_ids):
+    if delivered:
+        db.session.execute(update(SentMessage), delivered)
+    if failed_ids:
+        db.session.execute(
+            delete(SentMessage)
+            .where(SentMessage.id.in_(failed_ids))
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _insert_sent_messages(rows, now):
+    """Bulk-insert one ``SentMessage`` per (schedule, message, user) row."""
+    for attempt in range(3):
+        short_ids = _allocate_short_ids(len(rows))
+        sent_rows = [
+            {
+                'id': uuid.uuid4(),
+                'short_id': short_id,
+                'message_id': message.id,
+                'schedule_id': schedule.id,
+                'user_id': user.id,
+                'sent_at': now,
+                'status': 'sent',
+            }
+            for (schedule, message, user), short_id in zip(rows, short_ids)
+        ]
+        try:
+            db.session.execute(insert(SentMessage), sent_rows)
+            db.session.commit()
+            return sent_rows
+        except IntegrityError:
+            db.session.rollback()
+            if attempt == 2:
+                raise
 
 
-def _update_next_run(schedule):
-    """Calculate and set the next_run_at based on cron expression and timezone."""
-    tz = pytz.timezone(schedule.timezone)
-    local_now = datetime.now(tz)
-    cron = croniter(schedule.cron_expression, local_now)
-    next_local = cron.get_next(datetime)
-    schedule.next_run_at = next_local.astimezone(pytz.utc).replace(tzinfo=None)
+def _allocate_short_ids(count):
+    """Reserve ``count`` short_ids (a sequence on PostgreSQL, ``short_id_counter`` on SQLite)."""
+    if db.engine.dialect.name == 'postgresql':
+        return list(db.session.scalars(
+            text("SELECT nextval('sent_messages_short_id_seq') FROM generate_series(1, :n)"),
+            {'n': count},
+        ))
+    if db.session.get(ShortIdCounter, 1) is None:
+        # Database created without `flask db-upgrade`
+        db.session.add(ShortIdCounter(id=1, value=0))
+        db.session.flush()
+    end = db.session.execute(
+        text(
+            "UPDATE short_id_counter "
+            "SET value = MAX(value, (SELECT COALESCE(MAX(short_id), 0) FROM sent_messages)) + :n "
+            "WHERE id = 1 RETURNING value"
+        ),
+        {'n': count},
+    ).scalar()
+    return list(range(end - count + 1, end + 1))
 
 
 def calculate_next_run(cron_expression, timezone_str='UTC'):
     """Helper to calculate next_run_at for a new/updated schedule."""
-    tz = pytz.timezone(timezone_str)
-    local_now = datetime.now(tz)
-    cron = croniter(cron_expression, local_now)
-    next_local = cron.get_next(datetime)
-    return next_local.astimezone(pytz.utc).replace(tzinfo=None)
+    return next_run(cron_expression, timezone_str)
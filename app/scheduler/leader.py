@@ -0,0 +1,98 @@
+import atexit
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models import SchedulerLease
+
+
+class LeaderElector:
+    """Lease-based leader election over the ``scheduler_leases`` table.
+
+    Every process heartbeats; the one holding an unexpired lease row is the
+    leader and renews it, any other process can take the row over once the
+    lease runs out. Leadership is also given up locally when a renewal has
+    not succeeded within the lease period, so a process cut off from the
+    database stops acting as leader before anyone else can take over.
+    """
+
+    def __init__(self, name='scheduler'):
+        self.name = name
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = 30
+        self._valid_until = 0.0
+
+    def init_app(self, app):
+        self.lease_seconds = app.config.get('SCHEDULER_LEASE_SECONDS', 30)
+        atexit.register(self._release_at_exit, app)
+
+    @property
+    def is_leader(self):
+        return time.monotonic() < self._valid_until
+
+    def heartbeat(self, app):
+        """Acquire or renew the lease. Returns True while this process leads."""
+        with app.app_context():
+            started = time.monotonic()
+            try:
+                acquired = self._try_acquire()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Leader heartbeat failed: {e}")
+                acquired = False
+            self._valid_until = started + self.lease_seconds if acquired else 0.0
+            return acquired
+
+    def _try_acquire(self):
+        now = datetime.utcnow()
+        expires = now + timedelta(seconds=self.lease_seconds)
+        result = db.session.execute(
+            update(SchedulerLease)
+            .where(
+                SchedulerLease.name == self.name,
+                or_(SchedulerLease.owner == self.owner, SchedulerLease.expires_at < now),
+            )
+            .values(owner=self.owner, expires_at=expires, heartbeat_at=now)
+        )
+        if result.rowcount:
+            db.session.commit()
+            return True
+
+        db.session.rollback()
+        if db.session.get(SchedulerLease, self.name) is not None:
+            return False
+
+        # First process ever: create the row; a concurrent creator wins the race
+        db.session.add(SchedulerLease(
+            name=self.name, owner=self.owner, expires_at=expires, heartbeat_at=now
+        ))
+        try:
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+            return False
+
+    def _release_at_exit(self, app):
+        if not self.is_leader:
+            return
+        self._valid_until = 0.0
+        try:
+            with app.app_context():
+                db.session.execute(
+                    update(SchedulerLease)
+                    .where(SchedulerLease.name == self.name, SchedulerLease.owner == self.owner)
+                    .values(expires_at=datetime.utcnow())
+                )
+                db.session.commit()
+        except Exception:
+            pass
+
+
+leader = LeaderElector()
@@ -0,0 +1,105 @@
+import heapq
+import threading
+from datetime import datetime, timedelta
+
+import pytz
+
+from app.extensions import db
+from app.models import Schedule, Message, User
+
+
+class WakeupPlanner:
+    """Keeps the dispatch job asleep until the next schedule is actually due.
+
+    Holds a min-heap of upcoming ``next_run_at`` values (``claimed_until`` for
+    claimed rows); the sleep is capped at ``SCHEDULER_MAX_SLEEP_SECONDS``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heap = []
+        self._wake_at = None
+        self.scheduler = None
+
+    def init_app(self, app, scheduler, job_func, job_id):
+        self.app = app
+        self.scheduler = scheduler
+        self.job_func = job_func
+        self.job_id = job_id
+        self.max_sleep = app.config.get('SCHEDULER_MAX_SLEEP_SECONDS', 60)
+        self.window = app.config.get('SCHEDULER_PREFETCH', 500)
+
+    def refill(self):
+        """Reload the next ``window`` sendable run times (one indexed query)."""
+        now = datetime.utcnow()
+        rows = db.session.execute(
+            db.select(Schedule.next_run_at, Schedule.claimed_until)
+            .join(Message, Schedule.message_id == Message.id)
+            .join(User, Schedule.user_id == User.id)
+            .where(
+                Schedule.is_active.is_(True),
+                Schedule.next_run_at.isnot(None),
+                Message.is_active.is_(True),
+                User.bot_linked.is_(True),
+            )
+            .order_by(Schedule.next_run_at)
+            .limit(self.window)
+        )
+        runs = [
+            claimed_until if claimed_until and claimed_until >= now else next_run_at
+            for next_run_at, claimed_until in rows
+        ]
+        heapq.heapify(runs)
+        with self._lock:
+            self._heap = runs
+
+    def has_due(self, now=None):
+        now = now or datetime.utcnow()
+        with self._lock:
+            return bool(self._heap) and self._heap[0] <= now
+
+    def notify(self, next_run_at):
+        """A schedule will next run at ``next_run_at``; wake up earlier if needed."""
+        if next_run_at is None:
+            return
+        with self._lock:
+            heapq.heappush(self._heap, next_run_at)
+            if self._wake_at is not None and next_run_at >= self._wake_at:
+                return
+        self.arm()
+
+    def wake_now(self):
+        """Run the dispatch job as soon as possible (e.g. a message was re-enabled)."""
+        self.notify(datetime.utcnow())
+
+    def arm(self, idle=False):
+        """(Re)schedule the one-shot dispatch job at the earliest pending run.
+
+        With ``idle`` the heap is ignored and the job just sleeps for the
+        maximum interval (used by processes that are not sending).
+        """
+        if self.scheduler is None:
+            return
+        now = datetime.utcnow()
+        wake_at = now + timedelta(seconds=self.max_sleep)
+        with self._lock:
+            # Drop entries that are already due: the upcoming run handles them
+            while not idle and self._heap and self._heap[0] < now:
+                heapq.heappop(self._heap)
+                wake_at = now
+            if not idle and self._heap:
+                wake_at = min(wake_at, self._heap[0])
+            self._wake_at = wake_at
+        self.scheduler.add_job(
+            func=self.job_func,
+            trigger='date',
+            run_date=pytz.utc.localize(wake_at),
+            id=self.job_id,
+            kwargs={'app': self.app},
+            misfire_grace_time=None,
+            coalesce=True,
+            replace_existing=True,
+        )
+
+
+planner = WakeupPlanner()
@@ -5,7 +5,8 @@ from wtforms import (
 )
 from wtforms.validators import DataRequired, Optional, NumberRange
 from wtforms.widgets import CheckboxInput, ListWidget
-from croniter import croniter
+
+from app.scheduler.cron import compile_cron
 
 
 COMMON_TIMEZONES = sorted(pytz.common_timezones)
@@ -57,7 +58,7 @@ class ScheduleForm(FlaskForm):
 
         # Validate the resulting cron expression
         try:
-            croniter(self.cron_expression.data)
+            compile_cron(self.cron_expression.data)
         except (ValueError, KeyError) as e:
             self.cron_expression.errors.append(f'Invalid cron expression: {e}')
             return False
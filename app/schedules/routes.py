@@ -9,6 +9,7 @@ from app.schedules.forms import ScheduleForm
 from app.extensions import db
 from app.models import Message, Schedule
 from app.scheduler.jobs import calculate_next_run
+from app.scheduler.wakeup import planner
 
 
 @schedules_bp.route('/messages/<message_id>/schedules/new', methods=['GET', 'POST'])
@@ -34,6 +35,7 @@ def create(message_id):
         )
         db.session.add(sched)
         db.session.commit()
+        planner.notify(sched.next_run_at)
         flash('Schedule created.', 'success')
         return redirect(url_for('messages.detail', message_id=msg.id))
 
@@ -57,6 +59,7 @@ def edit(schedule_id):
         sched.timezone = form.timezone.data
         sched.next_run_at = calculate_next_run(form.cron_expression.data, form.timezone.data)
         db.session.commit()
+        planner.notify(sched.next_run_at)
         flash('Schedule updated.', 'success')
         return redirect(url_for('messages.detail', message_id=msg.id))
 
@@ -75,6 +78,8 @@ def toggle(schedule_id):
     if sched.is_active:
         sched.next_run_at = calculate_next_run(sched.cron_expression, sched.timezone)
     db.session.commit()
+    if sched.is_active:
+        planner.notify(sched.next_run_at)
 
     if request.headers.get('HX-Request'):
         cron_desc = _safe_cron_desc(sched.cron_expression)
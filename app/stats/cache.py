@@ -0,0 +1,72 @@
+"""Cache for stats and dashboard data, keyed by the user's ``stats_version``.
+
+``STATS_CACHE_BACKEND`` (``"package.module:factory"``) replaces the in-process LRU.
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+from importlib import import_module
+
+from flask import jsonify, make_response, request
+from flask_login import current_user
+
+from app.cache import TTLCache
+
+
+class StatsCache:
+    def __init__(self):
+        self.backend = TTLCache(ttl=300, maxsize=10000)
+        self.not_modified = 0
+
+    def init_app(self, app):
+        spec = app.config.get('STATS_CACHE_BACKEND')
+        if spec:
+            module_name, _, factory = spec.partition(':')
+            self.backend = getattr(import_module(module_name), factory)(app)
+        else:
+            self.backend = TTLCache(
+                ttl=app.config.get('STATS_CACHE_TTL', 300),
+                maxsize=app.config.get('STATS_CACHE_SIZE', 10000),
+            )
+
+    @staticmethod
+    def key(user, name, *args):
+        hour = datetime.utcnow().strftime('%Y%m%d%H')
+        return (str(user.id), name, args, user.stats_version or 0, hour)
+
+    def get_or_load(self, key, loader):
+        value = self.backend.get(key)
+        if value is None:
+            value = loader()
+            self.backend.set(key, value)
+        return value
+
+    def stats(self):
+        return dict(self.backend.stats(), not_modified=self.not_modified)
+
+
+stats_cache = StatsCache()
+
+
+def cached_json(view):
+    """Serve a stats view's dict from the cache, with an ETag for 304s.
+
+    The wrapped view returns a plain dict. The ETag is derived from the
+    cache key, so an unchanged user gets ``304 Not Modified`` without the
+    data being loaded or serialised.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = stats_cache.key(
+            current_user, request.endpoint, request.args.get('days', 30, type=int)
+        )
+        etag = hashlib.sha1(repr(key).encode()).hexdigest()
+        if etag in request.if_none_match:
+            stats_cache.not_modified += 1
+            response = make_response('', 304)
+        else:
+            response = jsonify(stats_cache.get_or_load(key, lambda: view(*args, **kwargs)))
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
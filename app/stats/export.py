@@ -0,0 +1,90 @@
+"""Streaming export of a user's send/response history.
+
+Rows are read with ``yield_per`` (a server-side cursor on PostgreSQL) and
+written out a chunk at a time, so memory use does not grow with the size
+of the export. Shared by ``GET /stats/export`` and
+``flask export-responses``.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+
+from app.extensions import db
+from app.models import Message, SentMessage
+
+COLUMNS = [
+    'short_id', 'message_id', 'message_title', 'sent_at', 'status', 'response', 'responded_at',
+]
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def export_rows(user_id, message_id=None, since=None, until=None, status=None,
+                batch_size=1000):
+    """Yield the user's sends as tuples in ``COLUMNS`` order, oldest first.
+
+    ``since``/``until`` bound ``sent_at`` (inclusive/exclusive).
+    """
+    query = (
+        db.session.query(
+            SentMessage.short_id,
+            SentMessage.message_id,
+            Message.title,
+            SentMessage.sent_at,
+            SentMessage.status,
+            SentMessage.response,
+            SentMessage.responded_at,
+        )
+        .join(Message, SentMessage.message_id == Message.id)
+        .filter(SentMessage.user_id == user_id)
+    )
+    if message_id is not None:
+        query = query.filter(SentMessage.message_id == message_id)
+    if since is not None:
+        query = query.filter(SentMessage.sent_at >= since)
+    if until is not None:
+        query = query.filter(SentMessage.sent_at < until)
+    if status:
+        query = query.filter(SentMessage.status == status)
+    yield from query.order_by(SentMessage.sent_at, SentMessage.id).yield_per(batch_size)
+
+
+def iter_csv(rows, chunk_rows=500):
+    """Encode rows as CSV with a header line, yielding text chunks."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMNS)
+    for n, row in enumerate(rows, 1):
+        writer.writerow([_format(value) for value in row])
+        if n % chunk_rows == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def iter_jsonl(rows, chunk_rows=500):
+    """Encode rows as one JSON object per line, yielding text chunks."""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(COLUMNS, map(_format, row)))) + '\n')
+        if len(lines) >= chunk_rows:
+            yield ''.join(lines)
+            lines = []
+    yield ''.join(lines)
+
+
+def encode(rows, fmt):
+    return iter_csv(rows) if fmt == 'csv' else iter_jsonl(rows)
+
+
+def _format(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if value is None or isinstance(value, (int, str)):
+        return value
+    return str(value)
@@ -0,0 +1,184 @@
+"""Incrementally maintained rollups of sent_messages.
+
+``daily_stats`` keeps sent/responded counts and summed response time per
+(user, message, day, hour) and ``daily_response_stats`` keeps a histogram of
+response values per (user, message, day). Both are bucketed by the UTC
+``sent_at`` of the send, so a response updates the bucket of the message it
+answers. Stats and dashboard reads cost O(days) instead of O(rows sent).
+
+Every write also bumps ``users.stats_version`` so cached stats for the
+affected users stop matching (see app.stats.cache).
+"""
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from sqlalchemy import and_, case, delete, func, insert, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.extensions import db
+from app.models import DailyStat, DailyResponseStat, SentMessage, User
+from app.stats.sql import day_label, hour, minutes_between
+
+
+def _upsert_increment(model, rows, key_columns, counter_columns):
+    """Insert ``rows``, adding their counters onto any existing rows."""
+    if not rows:
+        return
+    dialect_insert = (
+        postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+    )
+    stmt = dialect_insert(model)
+    table = model.__table__
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={col: table.c[col] + stmt.excluded[col] for col in counter_columns},
+    )
+    db.session.execute(stmt, rows)
+
+
+def bump_stats_version(*user_ids):
+    """Invalidate cached stats of ``user_ids``. Joins the caller's transaction."""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    db.session.execute(
+        update(User)
+        .where(User.id.in_(user_ids))
+        .values(stats_version=User.stats_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def record_sent(sent_rows):
+    """Count delivered sends. ``sent_rows`` are dicts with ``user_id``,
+    ``message_id`` and ``sent_at``. Joins the caller's transaction."""
+    counts = Counter(
+        (row['user_id'], row['message_id'], row['sent_at'].date(), row['sent_at'].hour)
+        for row in sent_rows
+    )
+    _upsert_increment(
+        DailyStat,
+        [
+            {'user_id': u, 'message_id': m, 'day': d, 'hour': h,
+             'sent_count': n, 'responded_count': 0, 'response_seconds': 0.0}
+            for (u, m, d, h), n in counts.items()
+        ],
+        ['user_id', 'message_id', 'day', 'hour'],
+        ['sent_count'],
+    )
+    bump_stats_version(*(row['user_id'] for row in sent_rows))
+
+
+def record_responses(responses):
+    """Count recorded responses. ``responses`` are ``SentMessage``-like objects
+    with ``user_id``, ``message_id``, ``sent_at``, ``responded_at`` and
+    ``response``. Joins the caller's transaction."""
+    stats = defaultdict(lambda: [0, 0.0])
+    histogram = Counter()
+    for r in responses:
+        key = (r.user_id, r.message_id, r.sent_at.date())
+        bucket = stats[key + (r.sent_at.hour,)]
+        bucket[0] += 1
+        bucket[1] += (r.responded_at - r.sent_at).total_seconds()
+        if r.response:
+            histogram[key + (r.response,)] += 1
+
+    _upsert_increment(
+        DailyStat,
+        [
+            {'user_id': u, 'message_id': m, 'day': d, 'hour': h,
+             'sent_count': 0, 'responded_count': n, 'response_seconds': secs}
+            for (u, m, d, h), (n, secs) in stats.items()
+        ],
+        ['user_id', 'message_id', 'day', 'hour'],
+        ['responded_count', 'response_seconds'],
+    )
+    _upsert_increment(
+        DailyResponseStat,
+        [
+            {'user_id': u, 'message_id': m, 'day': d, 'response': resp, 'count': n}
+            for (u, m, d, resp), n in histogram.items()
+        ],
+        ['user_id', 'message_id', 'day', 'response'],
+        ['count'],
+    )
+    bump_stats_version(*(r.user_id for r in responses))
+
+
+def since_filter(since):
+    """Rollup buckets at or after the hour containing ``since``."""
+    day = since.date()
+    return or_(
+        DailyStat.day > day,
+        and_(DailyStat.day == day, DailyStat.hour >= since.hour),
+    )
+
+
+def backfill(batch_size=5000):
+    """Rebuild both rollups from sent_messages. Returns the number of buckets.
+
+    Only days from the oldest row still in sent_messages onwards are
+    rebuilt; buckets for archived months (see app.retention) are kept.
+    """
+    oldest = db.session.query(func.min(SentMessage.sent_at)).scalar()
+    if oldest is None:
+        return 0
+    db.session.execute(delete(DailyStat).where(DailyStat.day >= oldest.date()))
+    db.session.execute(delete(DailyResponseStat).where(DailyResponseStat.day >= oldest.date()))
+
+    day = day_label(SentMessage.sent_at)
+    hr = hour(SentMessage.sent_at)
+    responded = SentMessage.status == 'responded'
+    answered = responded & SentMessage.responded_at.isnot(None)
+    stats_query = (
+        db.session.query(
+            SentMessage.user_id, SentMessage.message_id, day, hr,
+            func.count(SentMessage.id),
+            func.coalesce(func.sum(case((answered, 1), else_=0)), 0),
+            func.coalesce(func.sum(case(
+                (answered, minutes_between(SentMessage.sent_at, SentMessage.responded_at) * 60),
+                else_=0,
+            )), 0),
+        )
+        .group_by(SentMessage.user_id, SentMessage.message_id, day, hr)
+    )
+    buckets = _insert_in_batches(DailyStat, (
+        {'user_id': u, 'message_id': m, 'day': _to_date(d), 'hour': int(h),
+         'sent_count': sent, 'responded_count': n, 'response_seconds': float(secs)}
+        for u, m, d, h, sent, n, secs in stats_query.yield_per(batch_size)
+    ), batch_size)
+
+    histogram_query = (
+        db.session.query(
+            SentMessage.user_id, SentMessage.message_id, day, SentMessage.response,
+            func.count(SentMessage.id),
+        )
+        .filter(responded, SentMessage.response.isnot(None), SentMessage.response != '')
+        .group_by(SentMessage.user_id, SentMessage.message_id, day, SentMessage.response)
+    )
+    _insert_in_batches(DailyResponseStat, (
+        {'user_id': u, 'message_id': m, 'day': _to_date(d), 'response': resp, 'count': n}
+        for u, m, d, resp, n in histogram_query.yield_per(batch_size)
+    ), batch_size)
+
+    db.session.commit()
+    return buckets
+
+
+def _insert_in_batches(model, rows, batch_size):
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(insert(model), batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(model), batch)
+        total += len(batch)
+    return total
+
+
+def _to_date(label):
+    return datetime.strptime(label, '%Y-%m-%d').date()
@@ -1,13 +1,17 @@
+import uuid
 from datetime import datetime, timedelta
-from collections import defaultdict
 
-from flask import render_template, request, jsonify
+from flask import Response, abort, render_template, request, stream_with_context
 from flask_login import login_required, current_user
-from sqlalchemy import func, extract
+from sqlalchemy import func
 
 from app.stats import stats_bp
 from app.extensions import db
-from app.models import SentMessage, Message
+from app.models import SentMessage, Message, DailyStat, DailyResponseStat
+from app.stats.cache import cached_json
+from app.stats.export import FORMATS, encode, export_rows
+from app.stats.rollup import since_filter
+from app.stats.sql import hour, weekday
 
 
 @stats_bp.route('/')
@@ -18,68 +22,58 @@ def index():
 
 @stats_bp.route('/api/overview')
 @login_required
+@cached_json
 def api_overview():
     days = request.args.get('days', 30, type=int)
     since = datetime.utcnow() - timedelta(days=days)
     user_id = current_user.id
 
-    total_sent = SentMessage.query.filter(
-        SentMessage.user_id == user_id,
-        SentMessage.sent_at >= since,
-    ).count()
-
-    total_responded = SentMessage.query.filter(
-        SentMessage.user_id == user_id,
-        SentMessage.sent_at >= since,
-        SentMessage.status == 'responded',
-    ).count()
+    total_sent, total_responded, response_seconds = (
+        db.session.query(
+            func.coalesce(func.sum(DailyStat.sent_count), 0),
+            func.coalesce(func.sum(DailyStat.responded_count), 0),
+            func.coalesce(func.sum(DailyStat.response_seconds), 0),
+        )
+        .filter(DailyStat.user_id == user_id, since_filter(since))
+        .one()
+    )
 
     response_rate = round((total_responded / total_sent * 100), 1) if total_sent > 0 else 0
 
     # Average response time in minutes
-    responded_msgs = SentMessage.query.filter(
-        SentMessage.user_id == user_id,
-        SentMessage.sent_at >= since,
-        SentMessage.status == 'responded',
-        SentMessage.responded_at.isnot(None),
-    ).all()
-
-    if responded_msgs:
-        total_mins = sum(
-            (m.responded_at - m.sent_at).total_seconds() / 60 for m in responded_msgs
-        )
-        avg_response_time = round(total_mins / len(responded_msgs), 1)
+    if total_responded:
+        avg_response_time = round(float(response_seconds) / 60 / total_responded, 1)
     else:
         avg_response_time = 0
 
-    return jsonify({
+    return {
         "total_sent": total_sent,
         "total_responded": total_responded,
         "response_rate": response_rate,
         "avg_response_time_minutes": avg_response_time,
-    })
+    }
 
 
 @stats_bp.route('/api/response-over-time')
 @login_required
+@cached_json
 def api_response_over_time():
     days = request.args.get('days', 30, type=int)
     since = datetime.utcnow() - timedelta(days=days)
     user_id = current_user.id
 
-    sent_msgs = SentMessage.query.filter(
-        SentMessage.user_id == user_id,
-        SentMessage.sent_at >= since,
-    ).all()
-
-    sent_by_date = defaultdict(int)
-    responded_by_date = defaultdict(int)
-
-    for m in sent_msgs:
-        d = m.sent_at.strftime('%Y-%m-%d')
-        sent_by_date[d] += 1
-        if m.status == 'responded':
-            responded_by_date[d] += 1
+    rows = (
+        db.session.query(
+            DailyStat.day,
+            func.sum(DailyStat.sent_count),
+            func.sum(DailyStat.responded_count),
+        )
+        .filter(DailyStat.user_id == user_id, since_filter(since))
+        .group_by(DailyStat.day)
+        .all()
+    )
+    sent_by_date = {d.strftime('%Y-%m-%d'): sent for d, sent, _ in rows}
+    responded_by_date = {d.strftime('%Y-%m-%d'): responded for d, _, responded in rows}
 
     # Generate all dates in range
     labels = []
@@ -89,67 +83,100 @@ def api_response_over_time():
         labels.append(current.strftime('%Y-%m-%d'))
         current += timedelta(days=1)
 
-    return jsonify({
+    return {
         "labels": labels,
         "sent": [sent_by_date.get(d, 0) for d in labels],
         "responded": [responded_by_date.get(d, 0) for d in labels],
-    })
+    }
 
 
 @stats_bp.route('/api/response-distribution')
 @login_required
+@cached_json
 def api_response_distribution():
     user_id = current_user.id
 
-    messages = Message.query.filter_by(user_id=user_id).all()
-    result = []
-
-    for msg in messages:
-        sent_msgs = SentMessage.query.filter(
-            SentMessage.message_id == msg.id,
-            SentMessage.status == 'responded',
-        ).all()
-
-        responses = defaultdict(int)
-        for sm in sent_msgs:
-            if sm.response:
-                responses[sm.response] += 1
+    # One aggregate over the response histogram rollup for all of the user's messages
+    rows = (
+        db.session.query(
+            Message.id, Message.title, DailyResponseStat.response,
+            func.sum(DailyResponseStat.count),
+        )
+        .join(DailyResponseStat, DailyResponseStat.message_id == Message.id)
+        .filter(Message.user_id == user_id)
+        .group_by(Message.id, Message.title, Message.created_at, DailyResponseStat.response)
+        .order_by(Message.created_at, Message.id)
+        .all()
+    )
 
-        if responses:
-            result.append({
-                "title": msg.title,
-                "responses": dict(responses),
-            })
+    by_message = {}
+    for message_id, title, response, count in rows:
+        if response:
+            entry = by_message.setdefault(message_id, {"title": title, "responses": {}})
+            entry["responses"][response] = count
 
-    return jsonify({"messages": result})
+    return {"messages": list(by_message.values())}
 
 
 @stats_bp.route('/api/activity-heatmap')
 @login_required
+@cached_json
 def api_activity_heatmap():
     days = request.args.get('days', 30, type=int)
     since = datetime.utcnow() - timedelta(days=days)
     user_id = current_user.id
 
-    sent_msgs = SentMessage.query.filter(
-        SentMessage.user_id == user_id,
-        SentMessage.status == 'responded',
-        SentMessage.responded_at.isnot(None),
-        SentMessage.responded_at >= since,
-    ).all()
-
-    # heatmap[day_of_week][hour] = count
-    heatmap = defaultdict(lambda: defaultdict(int))
-    for m in sent_msgs:
-        dow = m.responded_at.weekday()  # 0=Mon, 6=Sun
-        hour = m.responded_at.hour
-        heatmap[dow][hour] += 1
-
-    data = []
-    for dow in range(7):
-        for hour in range(24):
-            count = heatmap[dow][hour]
-            if count > 0:
-                data.append({"day": dow, "hour": hour, "count": count})
-
-    return jsonify({"data": data})
+    dow = weekday(SentMessage.responded_at)  # 0=Mon, 6=Sun
+    hr = hour(SentMessage.responded_at)
+    rows = (
+        db.session.query(dow, hr, func.count(SentMessage.id))
+        .filter(
+            SentMessage.user_id == user_id,
+            SentMessage.status == 'responded',
+            SentMessage.responded_at.isnot(None),
+            SentMessage.responded_at >= since,
+        )
+        .group_by(dow, hr)
+        .order_by(dow, hr)
+        .all()
+    )
+
+    data = [
+        {"day": int(d), "hour": int(h), "count": count}
+        for d, h, count in rows if count > 0
+    ]
+
+    return {"data": data}
+
+
+@stats_bp.route('/export')
+@login_required
+def export():
+    """Stream the user's send history as CSV or JSONL.
+
+    Query args: ``format`` (csv/jsonl), ``message_id``, ``since`` and
+    ``until`` (ISO dates, ``until`` exclusive) and ``status``.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        abort(400)
+    try:
+        message_id = request.args.get('message_id')
+        message_id = uuid.UUID(message_id) if message_id else None
+        since = request.args.get('since')
+        since = datetime.fromisoformat(since) if since else None
+        until = request.args.get('until')
+        until = datetime.fromisoformat(until) if until else None
+    except ValueError:
+        abort(400)
+
+    rows = export_rows(
+        current_user.id, message_id=message_id, since=since, until=until,
+        status=request.args.get('status') or None,
+    )
+    filename = f"responses-{datetime.utcnow():%Y%m%d}.{fmt}"
+    return Response(
+        stream_with_context(encode(rows, fmt)),
+        mimetype=FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,40 @@
+"""Dialect-aware SQL expressions for the stats aggregates.
+
+Everything here renders to plain SQL on both PostgreSQL and SQLite so the
+stats endpoints can aggregate in the database instead of in Python.
+"""
+from sqlalchemy import Integer, cast, func
+
+from app.extensions import db
+
+
+def _is_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def minutes_between(start, end):
+    """``end - start`` in (fractional) minutes."""
+    if _is_postgres():
+        return func.extract('epoch', end - start) / 60.0
+    return (func.julianday(end) - func.julianday(start)) * 1440.0
+
+
+def day_label(column):
+    """The calendar day of a timestamp as a ``YYYY-MM-DD`` string."""
+    if _is_postgres():
+        return func.to_char(column, 'YYYY-MM-DD')
+    return func.strftime('%Y-%m-%d', column)
+
+
+def weekday(column):
+    """Day of week with Monday = 0 ... Sunday = 6 (like ``datetime.weekday``)."""
+    if _is_postgres():
+        return cast(func.extract('isodow', column), Integer) - 1
+    return (cast(func.strftime('%w', column), Integer) + 6) % 7
+
+
+def hour(column):
+    """Hour of day, 0-23."""
+    if _is_postgres():
+        return cast(func.extract('hour', column), Integer)
+    return cast(func.strftime('%H', column), Integer)
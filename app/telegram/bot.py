@@ -1,41 +1,36 @@
-import requests
 from flask import current_app
 
+from app.telegram.payloads import payload_cache
 
-def _api_url():
-    token = current_app.config['TELEGRAM_BOT_TOKEN']
-    return f"https://api.telegram.org/bot{token}"
+
+def _request(method, payload, deferred=False):
+    """Call a Bot API method through the app's pooled Telegram client.
+
+    With ``deferred=True`` the call is added to the outbound queue instead
+    and sent by the outbox dispatcher once the current transaction commits.
+    """
+    if deferred:
+        from app.telegram.outbox import enqueue
+        enqueue(method, payload)
+        return None
+    return current_app.extensions['telegram'].call(method, payload)
 
 
 def send_scheduled_message(user, message, sent_message_short_id):
     """Send a Telegram message with inline keyboard buttons.
 
     Uses short_id in callback_data to stay under Telegram's 64-byte limit.
+    The JSON body comes from the per-message template cache
+    (app.telegram.payloads), so repeated sends of a message only fill in
+    the chat and short_id.
     """
-    # Build keyboard
-    if message.response_type == 'yes_no':
-        buttons = [
-            [
-                {"text": "Yes", "callback_data": f"r_{sent_message_short_id}_yes"},
-                {"text": "No", "callback_data": f"r_{sent_message_short_id}_no"},
-            ]
-        ]
-    else:
-        options = message.custom_options or []
-        buttons = [[
-            {"text": opt, "callback_data": f"r_{sent_message_short_id}_{i}"}
-            for i, opt in enumerate(options)
-        ]]
-
-    payload = {
-        "chat_id": user.telegram_chat_id,
-        "text": message.body,
-        "parse_mode": "Markdown",
-        "reply_markup": {"inline_keyboard": buttons},
-    }
-
-    resp = requests.post(f"{_api_url()}/sendMessage", json=payload, timeout=10)
-    data = resp.json()
+    body = payload_cache.send_message_body(
+        message, user.telegram_chat_id, sent_message_short_id
+    )
+    client = current_app.extensions['telegram']
+    data = client.call_json(
+        "sendMessage", body, chat_id=user.telegram_chat_id, limiter=client.scheduler_limiter
+    )
 
     if data.get("ok"):
         return data["result"]["message_id"]
@@ -49,39 +44,34 @@ def send_test_message(user):
         "chat_id": user.telegram_chat_id,
         "text": "PingBot test message. Your bot link is working!",
     }
-    resp = requests.post(f"{_api_url()}/sendMessage", json=payload, timeout=10)
-    data = resp.json()
+    data = _request("sendMessage", payload)
     if not data.get("ok"):
         raise Exception(f"Telegram error: {data}")
 
 
-def answer_callback_query(callback_query_id, text=""):
+def send_text_message(chat_id, text, deferred=False):
+    """Send a plain text message to a chat."""
+    _request("sendMessage", {"chat_id": chat_id, "text": text}, deferred)
+
+
+def answer_callback_query(callback_query_id, text="", deferred=False):
     """Answer a callback query to dismiss the loading spinner."""
     payload = {"callback_query_id": callback_query_id}
     if text:
         payload["text"] = text
-    requests.post(f"{_api_url()}/answerCallbackQuery", json=payload, timeout=10)
+    _request("answerCallbackQuery", payload, deferred)
 
 
-def edit_message_text(chat_id, message_id, text):
-    """Edit a message's text."""
+def edit_message_text(chat_id, message_id, text, reply_markup=None, deferred=False):
+    """Edit a message's text, optionally replacing its inline keyboard in the
+    same call (pass ``{"inline_keyboard": []}`` to remove the buttons)."""
     payload = {
         "chat_id": chat_id,
         "message_id": message_id,
         "text": text,
         "parse_mode": "Markdown",
     }
-    requests.post(f"{_api_url()}/editMessageText", json=payload, timeout=10)
-
-
-def edit_message_reply_markup(chat_id, message_id, reply_markup=None):
-    """Edit or remove a message's inline keyboard."""
-    payload = {
-        "chat_id": chat_id,
-        "message_id": message_id,
-    }
-    if reply_markup:
+    if reply_markup is not None:
         payload["reply_markup"] = reply_markup
-    else:
-        payload["reply_markup"] = {"inline_keyboard": []}
-    requests.post(f"{_api_url()}/editMessageReplyMarkup", json=payload, timeout=10)
+    _request("editMessageText", payload, deferred)
+
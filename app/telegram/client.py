@@ -0,0 +1,97 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app import json_provider
+from app.telegram.ratelimit import limiter, scheduler_limiter
+
+
+class TelegramClient:
+    """Bot API client backed by one pooled, keep-alive ``requests.Session``.
+
+    Bound to the app as ``app.extensions['telegram']``. Connections to
+    api.telegram.org are reused across calls and threads, so a burst of
+    sends pays for the TCP/TLS handshake once per pooled connection rather
+    than once per message.
+    """
+
+    # How many times a call is retried after Telegram answers 429 Too Many Requests
+    MAX_RATE_LIMIT_RETRIES = 3
+    JSON_HEADERS = {"Content-Type": "application/json"}
+
+    def __init__(self, app=None):
+        self.session = None
+        self.limiter = limiter
+        self.scheduler_limiter = scheduler_limiter
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.base_url = app.config['TELEGRAM_API_URL']
+        self.token = app.config['TELEGRAM_BOT_TOKEN']
+        self.timeout = app.config.get('TELEGRAM_TIMEOUT', 10)
+        self.session = self._build_session(app.config.get('TELEGRAM_POOL_SIZE', 16))
+        self.limiter.init_app(app)
+        # Only the leader sends scheduled messages, unless election is off
+        self.scheduler_limiter.init_app(
+            app, processes=None if not app.config.get('SCHEDULER_LEADER_ELECTION', True) else 1
+        )
+        app.extensions['telegram'] = self
+
+    @staticmethod
+    def _build_session(pool_size):
+        # Only retry failures where Telegram cannot have acted on the request,
+        # i.e. the connection was never established. A gateway error (502/504)
+        # can arrive after a sendMessage went through, so it is not retried.
+        # 429s are handled by the limiter.
+        retry = Retry(
+            total=3,
+            connect=3,
+            read=0,
+            other=0,
+            status=0,
+            backoff_factor=0.3,
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def method_url(self, method):
+        return f"{self.base_url}/bot{self.token}/{method}"
+
+    def call(self, method, payload, timeout=None):
+        """POST a Bot API method through the shared rate limiter.
+
+        Calls addressed to a chat are paced per chat as well as globally.
+        On a 429 the limiter is told about ``retry_after`` and the call is
+        retried, so callers only see the error once retries are exhausted.
+        ``timeout`` overrides ``TELEGRAM_TIMEOUT`` (e.g. for long polls).
+        """
+        return self.call_json(method, json_provider.dumps(payload), payload.get("chat_id"), timeout)
+
+    def call_json(self, method, body, chat_id=None, timeout=None, limiter=None):
+        """Like ``call``, for a payload that is already serialised to JSON.
+
+        ``limiter`` replaces the shared limiter (scheduled sends pass
+        ``scheduler_limiter``).
+        """
+        limiter = limiter or self.limiter
+        for _ in range(self.MAX_RATE_LIMIT_RETRIES + 1):
+            limiter.acquire(chat_id)
+            resp = self.session.post(
+                self.method_url(method), data=body.encode(), headers=self.JSON_HEADERS,
+                timeout=timeout or self.timeout,
+            )
+            try:
+                data = json_provider.loads(resp.content)
+            except ValueError:
+                return {"ok": False, "error_code": resp.status_code, "description": resp.text}
+            if data.get("error_code") != 429:
+                return data
+            retry_after = data.get("parameters", {}).get("retry_after", 1)
+            limiter.backoff(retry_after, chat_id)
+        return data
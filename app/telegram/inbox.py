@@ -0,0 +1,194 @@
+"""Durable inbox for incoming Telegram updates, processed in batches by a consumer thread."""
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.extensions import db
+from app.models import InboundUpdate
+from app.telegram import outbox
+from app.telegram.updates import process_updates
+
+
+def enqueue(update_data):
+    """Store an update. Telegram redeliveries (same ``update_id``) are ignored."""
+    dialect_insert = (
+        postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+    )
+    db.session.execute(
+        dialect_insert(InboundUpdate)
+        .values(update_id=update_data.get('update_id'), payload=update_data)
+        .on_conflict_do_nothing(index_elements=['update_id'])
+    )
+
+
+def wake():
+    """Nudge this process's consumer to process the inbox now."""
+    consumer.wake()
+
+
+def claim_batch(batch_size, lease_seconds):
+    """Atomically claim up to ``batch_size`` due updates, oldest first.
+
+    Same lease protocol as ``outbox.claim_batch``: a consumer that dies
+    mid-batch only delays its updates.
+    """
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    due = (
+        db.select(InboundUpdate.id)
+        .where(
+            InboundUpdate.status.in_(('pending', 'processing')),
+            InboundUpdate.next_attempt_at <= now,
+        )
+        .order_by(InboundUpdate.id)
+        .limit(batch_size)
+    )
+    db.session.execute(
+        update(InboundUpdate)
+        .where(
+            InboundUpdate.id.in_(due.scalar_subquery()),
+            InboundUpdate.status.in_(('pending', 'processing')),
+            InboundUpdate.next_attempt_at <= now,
+        )
+        .values(
+            status='processing',
+            claimed_by=token,
+            next_attempt_at=now + timedelta(seconds=lease_seconds),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return (
+        InboundUpdate.query
+        .filter_by(claimed_by=token, status='processing')
+        .order_by(InboundUpdate.id)
+        .all()
+    )
+
+
+def drain(batch_size=None):
+    """Process claimed batches until the inbox is empty. Returns the count processed.
+
+    Each batch is applied and deleted in one transaction; an update that
+    fails is rolled back on its own (see ``process_updates``) and retried
+    with backoff, then marked ``failed`` after ``INBOX_MAX_ATTEMPTS``. If
+    the batch cannot be committed, its updates are retried one at a time.
+    """
+    config = current_app.config
+    batch_size = batch_size or config.get('INBOX_BATCH_SIZE', 100)
+    lease = config.get('INBOX_LEASE_SECONDS', 60)
+    max_attempts = config.get('INBOX_MAX_ATTEMPTS', 5)
+
+    processed = 0
+    while True:
+        batch = claim_batch(batch_size, lease)
+        if not batch:
+            return processed
+
+        ids = [item.id for item in batch]
+        try:
+            processed += _apply(batch, max_attempts)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Inbox batch failed, retrying one by one: {e}")
+            processed += _process_one_by_one(ids, max_attempts)
+        outbox.wake()
+
+
+def _apply(items, max_attempts):
+    """Process ``items`` in the current transaction: delete the ones that
+    were applied, schedule a retry for the rest. Returns the count applied."""
+    errors = {id(update): error for update, error in process_updates([item.payload for item in items])}
+    for item in items:
+        error = errors.get(id(item.payload))
+        if error is None:
+            db.session.delete(item)
+        else:
+            _retry_later(item, error, max_attempts)
+    return len(items) - len(errors)
+
+
+def _retry_later(item, error, max_attempts):
+    item.attempts = (item.attempts or 0) + 1
+    item.last_error = str(error)[:1000]
+    item.claimed_by = None
+    if item.attempts >= max_attempts:
+        item.status = 'failed'
+        print(f"Inbound update #{item.id} failed: {item.last_error}")
+    else:
+        item.status = 'pending'
+        item.next_attempt_at = datetime.utcnow() + timedelta(seconds=2 ** item.attempts)
+
+
+def _process_one_by_one(ids, max_attempts):
+    processed = 0
+    for item_id in ids:
+        try:
+            processed += _apply([db.session.get(InboundUpdate, item_id)], max_attempts)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            _retry_later(db.session.get(InboundUpdate, item_id), e, max_attempts)
+            db.session.commit()
+    return processed
+
+
+def stats():
+    """Inbox depth and age of the oldest unprocessed update."""
+    now = datetime.utcnow()
+    depth, oldest = (
+        db.session.query(func.count(InboundUpdate.id), func.min(InboundUpdate.received_at))
+        .filter(InboundUpdate.status.in_(('pending', 'processing')))
+        .one()
+    )
+    failed = InboundUpdate.query.filter_by(status='failed').count()
+    return {
+        'depth': depth,
+        'failed': failed,
+        'oldest_age_seconds': round((now - oldest).total_seconds(), 1) if oldest else 0,
+    }
+
+
+class InboxConsumer:
+    """Background thread that processes the inbox.
+
+    Woken by the webhook right after it stores an update, and otherwise
+    polls every ``INBOX_POLL_SECONDS`` to pick up retries and updates
+    stored by other processes.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._thread = None
+        self.app = None
+
+    def init_app(self, app):
+        self.app = app
+        self.poll_seconds = app.config.get('INBOX_POLL_SECONDS', 5)
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name='inbox-consumer', daemon=True
+            )
+            self._thread.start()
+
+    def wake(self):
+        self._event.set()
+
+    def _run(self):
+        while True:
+            self._event.wait(timeout=self.poll_seconds)
+            self._event.clear()
+            with self.app.app_context():
+                try:
+                    drain()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Inbox consumer error: {e}")
+
+
+consumer = InboxConsumer()
@@ -15,7 +15,10 @@ def generate_linking_code(user):
 
 
 def validate_linking_code(code, telegram_chat_id, telegram_username):
-    """Find user by code, link their Telegram, return True/False."""
+    """Find user by code, link their Telegram, return True/False.
+
+    Only flushes: the caller commits, together with the reply it queues.
+    """
     user = User.query.filter_by(linking_code=code.upper()).first()
     if not user or not user.linking_code_expires:
         return False
@@ -27,5 +30,5 @@ def validate_linking_code(code, telegram_chat_id, telegram_username):
     user.bot_linked = True
     user.linking_code = None
     user.linking_code_expires = None
-    db.session.commit()
+    db.session.flush()
     return True
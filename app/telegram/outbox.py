@@ -0,0 +1,211 @@
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, update
+
+from app.extensions import db
+from app.models import OutboundAction
+
+
+def enqueue(method, payload):
+    """Queue a Bot API call. It is sent once the caller's transaction commits
+    and ``wake()`` is called (or on the dispatcher's next poll)."""
+    db.session.add(OutboundAction(method=method, payload=payload))
+
+
+def wake():
+    """Nudge this process's dispatcher to drain the queue now."""
+    dispatcher.wake()
+
+
+def claim_batch(batch_size, lease_seconds):
+    """Atomically claim up to ``batch_size`` due actions for this caller.
+
+    Claimed rows have their ``next_attempt_at`` pushed out by the lease, so
+    a dispatcher that dies mid-batch only delays its rows, it never loses
+    them. The conditional UPDATE makes concurrent dispatchers in other
+    processes skip rows that were claimed first.
+    """
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    due = (
+        db.select(OutboundAction.id)
+        .where(
+            OutboundAction.status.in_(('pending', 'sending')),
+            OutboundAction.next_attempt_at <= now,
+        )
+        .order_by(OutboundAction.id)
+        .limit(batch_size)
+    )
+    db.session.execute(
+        update(OutboundAction)
+        .where(
+            OutboundAction.id.in_(due.scalar_subquery()),
+            OutboundAction.status.in_(('pending', 'sending')),
+            OutboundAction.next_attempt_at <= now,
+        )
+        .values(
+            status='sending',
+            claimed_by=token,
+            next_attempt_at=now + timedelta(seconds=lease_seconds),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return (
+        OutboundAction.query
+        .filter_by(claimed_by=token, status='sending')
+        .order_by(OutboundAction.id)
+        .all()
+    )
+
+
+def drain(batch_size=None):
+    """Send queued actions batch by batch until none are due.
+
+    Each action is committed as soon as its call returns: successful ones
+    are deleted, failures are retried with exponential backoff up to
+    ``OUTBOX_MAX_ATTEMPTS``. An action for a chat whose rate-limit bucket
+    is empty is pushed back until the bucket refills instead of holding
+    up the other chats. Returns the number of actions sent.
+    """
+    config = current_app.config
+    batch_size = batch_size or config.get('OUTBOX_BATCH_SIZE', 50)
+    max_attempts = config.get('OUTBOX_MAX_ATTEMPTS', 5)
+    lease = config.get('OUTBOX_LEASE_SECONDS', 60)
+    client = current_app.extensions['telegram']
+
+    sent_count = 0
+    while True:
+        batch = claim_batch(batch_size, lease)
+        if not batch:
+            return sent_count
+
+        renew_at = time.monotonic() + lease / 2
+        for action in batch:
+            if time.monotonic() > renew_at:
+                _renew(action.claimed_by, lease)
+                renew_at = time.monotonic() + lease / 2
+
+            chat_id = action.payload.get('chat_id')
+            wait = client.limiter.chat_wait(chat_id) if chat_id is not None else 0
+            if wait > 0:
+                action.status = 'pending'
+                action.claimed_by = None
+                action.next_attempt_at = datetime.utcnow() + timedelta(seconds=wait)
+                db.session.commit()
+                continue
+
+            try:
+                data = client.call(action.method, action.payload)
+            except Exception as e:
+                data = {"ok": False, "description": str(e)}
+
+            if data.get("ok"):
+                db.session.delete(action)
+                db.session.commit()
+                sent_count += 1
+                continue
+
+            action.attempts = (action.attempts or 0) + 1
+            action.last_error = str(data.get("description", data))[:1000]
+            action.claimed_by = None
+            code = data.get("error_code") or 0
+            # 4xx answers (bad request, message not modified, ...) will not
+            # succeed on retry; everything else backs off and tries again.
+            if action.attempts >= max_attempts or (400 <= code < 500 and code != 429):
+                action.status = 'failed'
+                print(f"Outbound {action.method} #{action.id} failed: {action.last_error}")
+            else:
+                action.status = 'pending'
+                action.next_attempt_at = (
+                    datetime.utcnow() + timedelta(seconds=2 ** action.attempts)
+                )
+            db.session.commit()
+
+
+def _renew(token, lease_seconds):
+    """Extend the lease on the rows of a batch that are still being sent."""
+    db.session.execute(
+        update(OutboundAction)
+        .where(OutboundAction.claimed_by == token, OutboundAction.status == 'sending')
+        .values(next_attempt_at=datetime.utcnow() + timedelta(seconds=lease_seconds))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def next_due_in():
+    """Seconds until the next queued action is due, or ``None`` if none is."""
+    due = db.session.scalar(
+        db.select(func.min(OutboundAction.next_attempt_at))
+        .where(OutboundAction.status.in_(('pending', 'sending')))
+    )
+    if due is None:
+        return None
+    return max(0.0, (due - datetime.utcnow()).total_seconds())
+
+
+def stats():
+    """Queue depth and age of the oldest undelivered action."""
+    now = datetime.utcnow()
+    depth, oldest = (
+        db.session.query(func.count(OutboundAction.id), func.min(OutboundAction.created_at))
+        .filter(OutboundAction.status.in_(('pending', 'sending')))
+        .one()
+    )
+    failed = OutboundAction.query.filter_by(status='failed').count()
+    return {
+        'depth': depth,
+        'failed': failed,
+        'oldest_age_seconds': round((now - oldest).total_seconds(), 1) if oldest else 0,
+    }
+
+
+class OutboxDispatcher:
+    """Background thread that drains the outbound queue.
+
+    Woken immediately after the webhook commits new actions, and otherwise
+    polls every ``OUTBOX_POLL_SECONDS`` to pick up retries and rows queued
+    by other processes.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._thread = None
+        self.app = None
+
+    def init_app(self, app):
+        self.app = app
+        self.poll_seconds = app.config.get('OUTBOX_POLL_SECONDS', 5)
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name='outbox-dispatcher', daemon=True
+            )
+            self._thread.start()
+
+    def wake(self):
+        self._event.set()
+
+    def _run(self):
+        timeout = self.poll_seconds
+        while True:
+            self._event.wait(timeout=timeout)
+            self._event.clear()
+            timeout = self.poll_seconds
+            with self.app.app_context():
+                try:
+                    drain()
+                    # Come back early for actions pushed back by the limiter
+                    due_in = next_due_in()
+                    if due_in is not None:
+                        timeout = min(timeout, max(due_in, 0.05))
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Outbox dispatcher error: {e}")
+
+
+dispatcher = OutboxDispatcher()
@@ -0,0 +1,73 @@
+"""Pre-serialised ``sendMessage`` payloads, cached per message until its ``updated_at`` changes."""
+import json
+
+from app.cache import TTLCache
+
+# Slots in a compiled template
+CHAT_ID = object()
+SHORT_ID = object()
+
+
+def keyboard_options(message):
+    """``(button text, callback value)`` pairs for a message's buttons."""
+    if message.response_type == 'yes_no':
+        return [("Yes", "yes"), ("No", "no")]
+    return [(opt, str(i)) for i, opt in enumerate(message.custom_options or [])]
+
+
+def compile_send_message(message):
+    """Build the ``sendMessage`` JSON for ``message`` as a tuple of fragments."""
+    buttons = []
+    for text, value in keyboard_options(message):
+        if buttons:
+            buttons.append(', ')
+        buttons += [
+            '{"text": ' + json.dumps(text) + ', "callback_data": "r_',
+            SHORT_ID,
+            '_' + value + '"}',
+        ]
+    parts = [
+        '{"chat_id": ', CHAT_ID,
+        ', "text": ' + json.dumps(message.body)
+        + ', "parse_mode": "Markdown", "reply_markup": {"inline_keyboard": [[',
+        *buttons,
+        ']]}}',
+    ]
+    # Merge adjacent literal fragments
+    template = []
+    for part in parts:
+        if isinstance(part, str) and template and isinstance(template[-1], str):
+            template[-1] += part
+        else:
+            template.append(part)
+    return tuple(template)
+
+
+def render(template, chat_id, short_id):
+    chat_id, short_id = str(chat_id), str(short_id)
+    return ''.join(
+        chat_id if part is CHAT_ID else short_id if part is SHORT_ID else part
+        for part in template
+    )
+
+
+class PayloadCache:
+    def __init__(self, maxsize=4096):
+        self.cache = TTLCache(ttl=86400, maxsize=maxsize)
+
+    def send_message_body(self, message, chat_id, short_id):
+        """JSON body of the ``sendMessage`` call for one scheduled send."""
+        cached = self.cache.get(message.id)
+        if cached is None or cached[0] != message.updated_at:
+            cached = (message.updated_at, compile_send_message(message))
+            self.cache.set(message.id, cached)
+        return render(cached[1], chat_id, short_id)
+
+    def invalidate(self, message_id):
+        self.cache.delete(message_id)
+
+    def stats(self):
+        return self.cache.stats()
+
+
+payload_cache = PayloadCache()
@@ -0,0 +1,58 @@
+"""Per-process index of unanswered sends by short_id, used to check button presses without a query."""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.cache import TTLCache
+from app.extensions import db
+
+# Stored for short_ids answered in this process
+ANSWERED = 'answered'
+
+
+class PendingIndex:
+    def __init__(self):
+        self.cache = TTLCache(ttl=86400, maxsize=100000)
+
+    def init_app(self, app):
+        self.cache = TTLCache(
+            ttl=app.config.get('PENDING_INDEX_TTL', 86400),
+            maxsize=app.config.get('PENDING_INDEX_SIZE', 100000),
+        )
+
+    def add(self, short_id, user_id, message_id, sent_at, message):
+        self.cache.set(short_id, {
+            'user_id': user_id,
+            'message_id': message_id,
+            'sent_at': sent_at,
+            'response_type': message.response_type,
+            'custom_options': message.custom_options,
+            'body': message.body,
+        })
+
+    def get(self, short_id):
+        """The pending entry, ``ANSWERED``, or ``None`` when unknown here."""
+        return self.cache.get(short_id)
+
+    def mark_answered(self, short_id):
+        self.cache.set(short_id, ANSWERED)
+
+    def mark_answered_on_commit(self, short_id):
+        """Mark ``short_id`` answered once the current transaction commits."""
+        db.session().info.setdefault('answered_short_ids', set()).add(short_id)
+
+    def stats(self):
+        return self.cache.stats()
+
+
+pending_index = PendingIndex()
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_answered(session):
+    for short_id in session.info.pop('answered_short_ids', ()):
+        pending_index.mark_answered(short_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_answered(session):
+    session.info.pop('answered_short_ids', None)
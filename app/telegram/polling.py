@@ -0,0 +1,99 @@
+"""Long-polling ingestion (``flask poll-updates``), an alternative to the webhook.
+
+Failed updates are retried through the inbox (app.telegram.inbox).
+"""
+import time
+
+from app.extensions import db
+from app.scheduler.leader import LeaderElector
+from app.telegram import inbox, outbox
+from app.telegram.updates import process_updates
+
+ALLOWED_UPDATES = ["message", "callback_query"]
+
+
+class UpdatePoller:
+    def __init__(self, app, timeout=20, limit=100):
+        self.app = app
+        self.timeout = timeout
+        self.limit = limit
+        self.client = app.extensions['telegram']
+        self.lease = LeaderElector('telegram_poller')
+        self.lease.init_app(app)
+        # Telegram confirms every update below the offset we send next
+        self.offset = None
+
+    def start(self):
+        """Drop any webhook (getUpdates refuses to run while one is set)."""
+        data = self.client.call("deleteWebhook", {"drop_pending_updates": False})
+        if not data.get("ok"):
+            print(f"Error deleting webhook: {data}")
+
+    def run(self, once=False):
+        while True:
+            if not self.lease.heartbeat(self.app):
+                if once:
+                    print('Another poller holds the telegram_poller lease.')
+                    return 0
+                time.sleep(max(1, self.lease.lease_seconds // 3))
+                continue
+            processed = self.poll_once()
+            with self.app.app_context():
+                try:
+                    inbox.drain()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error retrying failed updates: {e}")
+            if once:
+                return processed
+
+    def poll_once(self):
+        """One long poll. Returns the number of updates processed."""
+        payload = {
+            "timeout": self.timeout,
+            "limit": self.limit,
+            "allowed_updates": ALLOWED_UPDATES,
+        }
+        if self.offset is not None:
+            payload["offset"] = self.offset
+        try:
+            data = self.client.call("getUpdates", payload, timeout=self.timeout + 10)
+        except Exception as e:
+            print(f"Error polling updates: {e}")
+            time.sleep(1)
+            return 0
+        if not data.get("ok"):
+            print(f"Error polling updates: {data}")
+            time.sleep(1)
+            return 0
+
+        updates = data.get("result", [])
+        if not updates:
+            return 0
+        with self.app.app_context():
+            self._process(updates)
+        self.offset = updates[-1]["update_id"] + 1
+        return len(updates)
+
+    def _process(self, updates):
+        """Apply a batch; updates that fail are stored in the inbox for retry."""
+        try:
+            self._apply(updates)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Update batch failed, retrying one by one: {e}")
+            for update in updates:
+                try:
+                    self._apply([update])
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error processing update {update.get('update_id')}, queued for retry: {e}")
+                    inbox.enqueue(update)
+                    db.session.commit()
+        outbox.wake()
+
+    def _apply(self, updates):
+        for update, error in process_updates(updates):
+            print(f"Error processing update {update.get('update_id')}, queued for retry: {error}")
+            inbox.enqueue(update)
+        db.session.commit()
@@ -0,0 +1,137 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Classic token bucket. Tokens may go negative: a caller that takes a
+    token from an empty bucket is told how long to wait for it instead of
+    being refused, which keeps callers queued in arrival order."""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def reserve(self, now):
+        """Take one token and return the number of seconds to wait for it."""
+        self._refill(now)
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def wait_time(self, now):
+        """Seconds until a token is available, without taking it."""
+        self._refill(now)
+        wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def block(self, seconds, now):
+        """Refuse to hand out tokens for ``seconds`` (Telegram's retry_after)."""
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = min(self.tokens, 0.0)
+
+    def idle(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity and self.blocked_until <= now
+
+
+class RateLimiter:
+    """Global + per-chat pacing for Bot API calls; ``acquire`` blocks until both allow it.
+
+    The buckets are per process, so the rates are split between ``processes``.
+    """
+
+    # Idle per-chat buckets are dropped once the map grows past this size
+    MAX_IDLE_CHATS = 10000
+
+    def __init__(self, global_rate=30, chat_rate=1, chat_burst=1):
+        self._lock = threading.Lock()
+        self.configure(global_rate, chat_rate, chat_burst)
+        self._reset_counters()
+
+    def init_app(self, app, processes=None):
+        self.configure(
+            app.config.get('TELEGRAM_GLOBAL_RATE', 30),
+            app.config.get('TELEGRAM_CHAT_RATE', 1),
+            app.config.get('TELEGRAM_CHAT_BURST', 1),
+            processes or app.config.get('TELEGRAM_RATE_PROCESSES', 1),
+        )
+
+    def configure(self, global_rate, chat_rate, chat_burst=1, processes=1):
+        processes = max(1, processes)
+        global_rate = global_rate / processes
+        with self._lock:
+            self.global_bucket = TokenBucket(global_rate, max(1.0, global_rate))
+            self.chat_rate = chat_rate / processes
+            self.chat_burst = chat_burst
+            self.chat_buckets = {}
+
+    def _reset_counters(self):
+        self.calls = 0
+        self.throttled_calls = 0
+        self.throttled_seconds = 0.0
+        self.retry_after_hits = 0
+
+    def _chat_bucket(self, chat_id, now):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) >= self.MAX_IDLE_CHATS:
+                self.chat_buckets = {
+                    k: b for k, b in self.chat_buckets.items() if not b.idle(now)
+                }
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    def acquire(self, chat_id=None):
+        """Wait until a call (optionally addressed to ``chat_id``) may be made."""
+        with self._lock:
+            now = time.monotonic()
+            wait = self.global_bucket.reserve(now)
+            if chat_id is not None:
+                wait = max(wait, self._chat_bucket(chat_id, now).reserve(now))
+            self.calls += 1
+            if wait > 0:
+                self.throttled_calls += 1
+                self.throttled_seconds += wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def chat_wait(self, chat_id):
+        """Seconds before a call to ``chat_id`` would go out without waiting."""
+        with self._lock:
+            bucket = self.chat_buckets.get(chat_id)
+            return bucket.wait_time(time.monotonic()) if bucket else 0.0
+
+    def backoff(self, retry_after, chat_id=None):
+        """Record a 429 and hold back the affected bucket for ``retry_after`` seconds."""
+        with self._lock:
+            now = time.monotonic()
+            self.retry_after_hits += 1
+            if chat_id is not None:
+                self._chat_bucket(chat_id, now).block(retry_after, now)
+            else:
+                self.global_bucket.block(retry_after, now)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'throttled_calls': self.throttled_calls,
+                'throttled_seconds': round(self.throttled_seconds, 3),
+                'retry_after_hits': self.retry_after_hits,
+                'tracked_chats': len(self.chat_buckets),
+            }
+
+
+limiter = RateLimiter()
+scheduler_limiter = RateLimiter()
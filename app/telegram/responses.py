@@ -0,0 +1,19 @@
+"""Recording button-press responses on sent_messages."""
+from sqlalchemy import update
+
+from app.extensions import db
+from app.models import SentMessage
+
+
+def record_response(short_id, response, responded_at):
+    """Store ``response`` for ``short_id`` unless it has already been answered.
+
+    Returns the answered row's ``(user_id, message_id, sent_at)``, or ``None``.
+    """
+    return db.session.execute(
+        update(SentMessage)
+        .where(SentMessage.short_id == short_id, SentMessage.status == 'sent')
+        .values(response=response, responded_at=responded_at, status='responded')
+        .returning(SentMessage.user_id, SentMessage.message_id, SentMessage.sent_at)
+        .execution_options(synchronize_session=False)
+    ).first()
@@ -0,0 +1,179 @@
+"""Processing of incoming Telegram updates (webhook, inbox and long polling); the caller commits."""
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.extensions import db
+from app.models import Message, SentMessage
+from app.stats.rollup import record_responses
+from app.telegram.linking import validate_linking_code
+from app.telegram.bot import answer_callback_query, edit_message_text, send_text_message
+from app.telegram.pending import ANSWERED, pending_index
+from app.telegram.responses import record_response
+
+
+def process_updates(updates):
+    """Handle a list of Telegram ``Update`` dicts, in order.
+
+    Each update runs in its own savepoint, so one that fails is rolled back
+    alone and the rest can still be committed. Returns ``[(update, error)]``
+    for the updates that failed.
+    """
+    failed = []
+    callbacks = []
+    for update_data in updates:
+        if 'message' in update_data:
+            try:
+                with db.session.begin_nested():
+                    _handle_message(update_data['message'])
+            except Exception as e:
+                failed.append((update_data, e))
+        elif 'callback_query' in update_data:
+            callbacks.append(update_data)
+    if callbacks:
+        failed += _handle_callbacks(callbacks)
+    return failed
+
+
+def _handle_message(msg):
+    """/start and /start <linking code>."""
+    text = msg.get('text', '')
+    chat_id = msg['chat']['id']
+    username = msg['from'].get('username', '')
+
+    if text.startswith('/start '):
+        code = text.split(' ', 1)[1].strip()
+        if validate_linking_code(code, chat_id, username):
+            _send_reply(chat_id, "Your Telegram account has been linked to PingBot! You will now receive scheduled messages here.")
+        else:
+            _send_reply(chat_id, "Invalid or expired linking code. Please generate a new code from PingBot settings.")
+    elif text == '/start':
+        _send_reply(chat_id, "Welcome to PingBot! To link your account, go to PingBot settings and generate a linking code.")
+
+
+def _parse_callback(callback_data):
+    """``r_<short_id>_<response_value>`` -> ``(short_id, value)``, or ``None``."""
+    parts = callback_data.split('_', 2)
+    if len(parts) < 3 or parts[0] != 'r':
+        return None
+    try:
+        return int(parts[1]), parts[2]
+    except ValueError:
+        return None
+
+
+def _handle_callbacks(updates):
+    """Record a batch of button presses. Returns the updates that failed."""
+    callbacks = [update_data['callback_query'] for update_data in updates]
+    parsed = [_parse_callback(cb.get('data', '')) for cb in callbacks]
+    unknown = {p[0] for p in parsed if p and pending_index.get(p[0]) is None}
+    if unknown:
+        _load_pending(unknown)
+
+    now = datetime.utcnow()
+    failed, responded, answered, edits = [], [], [], {}
+    try:
+        with db.session.begin_nested():
+            for update_data, callback, parsed_data in zip(updates, callbacks, parsed):
+                try:
+                    with db.session.begin_nested():
+                        result = _handle_callback(callback, parsed_data, now)
+                except Exception as e:
+                    failed.append((update_data, e))
+                    continue
+                if result is None:
+                    continue
+                short_id, recorded, edit = result
+                answered.append(short_id)
+                if recorded is not None:
+                    responded.append(recorded)
+                    edits[edit[0]] = edit[1]
+
+            record_responses(responded)
+            for (chat_id, tg_message_id), text in edits.items():
+                edit_message_text(
+                    chat_id, tg_message_id, text, reply_markup={"inline_keyboard": []}, deferred=True,
+                )
+    except Exception as e:
+        return [(update_data, e) for update_data in updates]
+
+    for short_id in answered:
+        pending_index.mark_answered_on_commit(short_id)
+    return failed
+
+
+def _handle_callback(callback, parsed_data, now):
+    """Answer one press. Returns ``None``, or ``(short_id, recorded, edit)``
+    when the message is now answered (``recorded`` is ``None`` if it
+    already was)."""
+    callback_id = callback['id']
+    if parsed_data is None:
+        answer_callback_query(callback_id, "Invalid response.", deferred=True)
+        return None
+
+    short_id, response_value = parsed_data
+    entry = pending_index.get(short_id)
+    if entry is None:
+        answer_callback_query(callback_id, "Message not found.", deferred=True)
+        return None
+
+    if entry == ANSWERED:
+        answer_callback_query(callback_id, "You already responded to this message.", deferred=True)
+        return None
+
+    display_response = _display_response(entry, response_value)
+    if display_response is None:
+        answer_callback_query(callback_id, "Invalid response.", deferred=True)
+        return None
+
+    recorded = record_response(short_id, display_response, now)
+    if recorded is None:
+        # Answered through another process, or by an earlier press in
+        # this batch that is not committed yet
+        answer_callback_query(callback_id, "You already responded to this message.", deferred=True)
+        return short_id, None, None
+
+    answer_callback_query(callback_id, f"Recorded: {display_response}", deferred=True)
+    # One edit per Telegram message however many presses it got: update
+    # the text and remove the buttons
+    chat_id = callback['message']['chat']['id']
+    tg_message_id = callback['message']['message_id']
+    edit = ((chat_id, tg_message_id), f"{entry['body']}\n\nYou answered: *{display_response}*")
+    return short_id, SimpleNamespace(
+        user_id=recorded.user_id, message_id=recorded.message_id, sent_at=recorded.sent_at,
+        responded_at=now, response=display_response,
+    ), edit
+
+
+def _load_pending(short_ids):
+    """Add the given short_ids to the pending index from the database."""
+    rows = (
+        db.session.query(
+            SentMessage.short_id, SentMessage.status, SentMessage.user_id,
+            SentMessage.message_id, SentMessage.sent_at,
+            Message.response_type, Message.custom_options, Message.body,
+        )
+        .join(Message, SentMessage.message_id == Message.id)
+        .filter(SentMessage.short_id.in_(short_ids))
+    )
+    for row in rows:
+        if row.status == 'responded':
+            pending_index.mark_answered(row.short_id)
+        else:
+            pending_index.add(row.short_id, row.user_id, row.message_id, row.sent_at, row)
+
+
+def _display_response(entry, response_value):
+    """The label recorded for a press, or ``None`` if it is not one of the buttons."""
+    if entry['response_type'] == 'custom' and entry['custom_options']:
+        try:
+            return entry['custom_options'][int(response_value)]
+        except (ValueError, IndexError):
+            return None
+    if response_value in ('yes', 'no'):
+        return response_value
+    return None
+
+
+def _send_reply(chat_id, text):
+    """Quick helper to queue a text reply."""
+    send_text_message(chat_id, text, deferred=True)
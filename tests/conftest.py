@@ -0,0 +1,71 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app
+from app.extensions import db
+from app.migrations import upgrade
+from app.models import Message, Schedule, User
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'BACKGROUND_JOBS': False,
+        'TELEGRAM_BOT_TOKEN': 'test-token',
+        'TELEGRAM_RATE_PROCESSES': 1,
+    })
+    with app.app_context():
+        upgrade()
+        yield app
+        db.session.remove()
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self.text = json.dumps(data)
+        self.content = self.text.encode()
+
+
+@pytest.fixture
+def bot_api(app, monkeypatch):
+    """Answer Bot API requests locally; records ``(method, payload)``."""
+    calls = []
+
+    def post(url, data=None, headers=None, timeout=None):
+        calls.append((url.rsplit('/', 1)[1], json.loads(data)))
+        return FakeResponse({'ok': True, 'result': {'message_id': 1000 + len(calls)}})
+
+    monkeypatch.setattr(app.extensions['telegram'].session, 'post', post)
+    return calls
+
+
+def make_user(email='user@example.com', chat_id=100):
+    user = User(
+        email=email, password_hash='x', telegram_chat_id=chat_id, bot_linked=True,
+    )
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def make_message(user, **fields):
+    message = Message(user_id=user.id, title='Check-in', body='Did you?', **fields)
+    db.session.add(message)
+    db.session.flush()
+    return message
+
+
+def make_schedule(user, message, next_run_at=None):
+    schedule = Schedule(
+        user_id=user.id, message_id=message.id, cron_expression='0 3 * * *', timezone='UTC',
+        next_run_at=next_run_at or datetime.utcnow() - timedelta(minutes=1),
+    )
+    db.session.add(schedule)
+    db.session.flush()
+    return schedule
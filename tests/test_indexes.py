@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models import SentMessage
+from tests.conftest import make_message, make_user
+
+
+@pytest.fixture
+def client(app):
+    # Several users, so that the planner's statistics make user_id selective
+    now = datetime.utcnow()
+    short_id = 0
+    for n in range(10):
+        user = make_user(f'user{n}@example.com', chat_id=100 + n)
+        for message in [make_message(user) for _ in range(4)]:
+            for hours in range(10):
+                short_id += 1
+                sent_at = now - timedelta(hours=hours)
+                db.session.add(SentMessage(
+                    message_id=message.id, user_id=user.id, short_id=short_id, sent_at=sent_at,
+                    status='responded' if short_id % 2 else 'sent',
+                    response='yes' if short_id % 2 else None,
+                    responded_at=sent_at + timedelta(minutes=5) if short_id % 2 else None,
+                ))
+    db.session.commit()
+    db.session.execute(db.text('ANALYZE'))
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+    client.message_id = message.id
+    return client
+
+
+def _plans(client, url, table):
+    """EXPLAIN QUERY PLAN of every query ``url`` runs against ``table``."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if f'FROM {table}' in statement and statement.lstrip().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        assert client.get(url).status_code == 200
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+    assert statements
+    connection = db.session.connection()
+    return [
+        ' '.join(row[-1] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters))
+        for statement, parameters in statements
+    ]
+
+
+@pytest.mark.parametrize('path, index', [
+    ('/messages/{id}', 'ix_sent_messages_message_sent'),
+    ('/messages/{id}/history', 'ix_sent_messages_message_sent'),
+    ('/stats/api/activity-heatmap', 'ix_sent_messages_user_responded'),
+    ('/stats/export', 'ix_sent_messages_user_sent'),
+])
+def test_sent_message_reads_use_an_index(client, path, index):
+    for plan in _plans(client, path.format(id=client.message_id), 'sent_messages'):
+        assert index in plan, plan
+
+
+def test_message_list_uses_the_user_created_index(client):
+    for plan in _plans(client, '/messages/', 'messages'):
+        assert 'ix_messages_user_created' in plan, plan
+
+
+def test_no_index_on_user_and_status(app):
+    names = {row[1] for row in db.session.execute(db.text("PRAGMA index_list('sent_messages')"))}
+    assert 'ix_sent_messages_user_status' not in names
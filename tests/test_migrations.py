@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from app.extensions import db
+from app.migrations import MIGRATIONS, upgrade
+from app.models import DailyStat, SchemaMigration, SentMessage
+from tests.conftest import make_message, make_user
+
+
+def test_a_fresh_database_has_every_migration_applied(app):
+    applied = set(db.session.scalars(db.select(SchemaMigration.id)))
+    assert applied == {name for name, _ in MIGRATIONS}
+    assert upgrade() == []
+
+
+def test_upgrading_fills_the_rollups_from_existing_sends(app):
+    user = make_user()
+    message = make_message(user)
+    sent_at = datetime.utcnow() - timedelta(days=3)
+    for short_id in (1, 2, 3):
+        db.session.add(SentMessage(
+            message_id=message.id, user_id=user.id, short_id=short_id, sent_at=sent_at,
+            status='responded' if short_id == 1 else 'sent',
+            response='yes' if short_id == 1 else None,
+            responded_at=sent_at + timedelta(minutes=5) if short_id == 1 else None,
+        ))
+    db.session.delete(db.session.get(SchemaMigration, '0008_stats_rollups'))
+    db.session.commit()
+
+    assert upgrade() == ['0008_stats_rollups']
+    sent, responded = db.session.execute(
+        db.select(func.sum(DailyStat.sent_count), func.sum(DailyStat.responded_count))
+    ).one()
+    assert (sent, responded) == (3, 1)
@@ -0,0 +1,75 @@
+import time
+from datetime import datetime
+
+from sqlalchemy import func
+
+from app.extensions import db
+from app.models import OutboundAction
+from app.telegram import outbox
+
+
+def _edit(chat_id):
+    outbox.enqueue('editMessageText', {'chat_id': chat_id, 'message_id': 1, 'text': 'x'})
+
+
+def test_a_busy_chat_does_not_hold_up_other_chats(app, bot_api):
+    app.extensions['telegram'].limiter.configure(30, 1)
+    for _ in range(3):
+        _edit(1)
+    _edit(2)
+    db.session.commit()
+
+    started = time.monotonic()
+    assert outbox.drain() == 2
+    assert time.monotonic() - started < 0.5
+    assert [payload['chat_id'] for _, payload in bot_api] == [1, 2]
+
+    pushed_back = OutboundAction.query.all()
+    assert [(a.status, a.attempts) for a in pushed_back] == [('pending', 0)] * 2
+    assert all(a.next_attempt_at > datetime.utcnow() for a in pushed_back)
+    assert 0 < outbox.next_due_in() <= 1
+
+
+def test_each_action_is_committed_after_its_call(app, bot_api, monkeypatch):
+    rows_at_call = []
+    post = app.extensions['telegram'].session.post
+
+    def counting_post(*args, **kwargs):
+        # Committed rows only, as another process would see them
+        with db.engine.connect() as conn:
+            rows_at_call.append(conn.scalar(db.select(func.count(OutboundAction.id))))
+        return post(*args, **kwargs)
+
+    monkeypatch.setattr(app.extensions['telegram'].session, 'post', counting_post)
+    for chat_id in (1, 2, 3):
+        _edit(chat_id)
+    db.session.commit()
+
+    assert outbox.drain() == 3
+    assert rows_at_call == [3, 2, 1]
+    assert OutboundAction.query.count() == 0
+
+
+def test_long_batches_renew_their_lease(app, bot_api, monkeypatch):
+    app.config['OUTBOX_LEASE_SECONDS'] = 0.2
+    post = app.extensions['telegram'].session.post
+
+    def slow_post(*args, **kwargs):
+        time.sleep(0.15)
+        return post(*args, **kwargs)
+
+    monkeypatch.setattr(app.extensions['telegram'].session, 'post', slow_post)
+    renewed = []
+    renew = outbox._renew
+
+    def counting_renew(token, lease):
+        renewed.append(token)
+        renew(token, lease)
+
+    monkeypatch.setattr(outbox, '_renew', counting_renew)
+    for chat_id in (1, 2, 3):
+        _edit(chat_id)
+    db.session.commit()
+
+    assert outbox.drain() == 3
+    assert renewed
@@ -0,0 +1,35 @@
+import pytest
+
+from app import create_app
+from app.telegram.ratelimit import RateLimiter
+
+
+def _limiters(tmp_path, **config):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'BACKGROUND_JOBS': False,
+        'TELEGRAM_RATE_PROCESSES': 4,
+        **config,
+    })
+    client = app.extensions['telegram']
+    return client.limiter, client.scheduler_limiter
+
+
+def test_the_leader_keeps_the_full_budget_for_scheduled_sends(tmp_path):
+    replies, scheduled = _limiters(tmp_path)
+    assert (replies.global_bucket.rate, replies.chat_rate) == (7.5, 0.25)
+    assert (scheduled.global_bucket.rate, scheduled.chat_rate) == (30, 1)
+
+
+def test_the_budget_is_split_when_every_process_sends(tmp_path):
+    _, scheduled = _limiters(tmp_path, SCHEDULER_LEADER_ELECTION=False)
+    assert (scheduled.global_bucket.rate, scheduled.chat_rate) == (7.5, 0.25)
+
+
+def test_a_chat_is_paced_without_taking_its_token():
+    limiter = RateLimiter(global_rate=30, chat_rate=2)
+    assert limiter.chat_wait(1) == 0
+    limiter.acquire(1)
+    assert limiter.chat_wait(1) == pytest.approx(0.5, abs=0.05)
+    assert limiter.chat_wait(1) == pytest.approx(0.5, abs=0.05)
+    assert limiter.chat_wait(2) == 0
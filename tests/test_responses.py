@@ -0,0 +1,54 @@
+import multiprocessing
+
+from app import create_app
+from app.extensions import db
+from app.models import DailyStat, OutboundAction, SentMessage
+from app.telegram.updates import process_updates
+from tests.conftest import make_message, make_user
+
+PRESSES = 8
+
+
+def _press_in_child(config, barrier, n):
+    app = create_app(config)
+    with app.app_context():
+        update = {'update_id': n, 'callback_query': {
+            'id': f'cb{n}', 'data': 'r_7_yes',
+            'message': {'chat': {'id': 100}, 'message_id': 1},
+        }}
+        barrier.wait()
+        assert process_updates([update]) == []
+        db.session.commit()
+
+
+def test_concurrent_presses_record_one_response(app):
+    user = make_user()
+    message = make_message(user)
+    db.session.add(SentMessage(message_id=message.id, user_id=user.id, short_id=7))
+    db.session.commit()
+
+    config = {
+        'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI'],
+        'BACKGROUND_JOBS': False,
+    }
+    ctx = multiprocessing.get_context('fork')
+    barrier = ctx.Barrier(PRESSES)
+    presses = [ctx.Process(target=_press_in_child, args=(config, barrier, n)) for n in range(PRESSES)]
+    for press in presses:
+        press.start()
+    for press in presses:
+        press.join(timeout=60)
+    assert [press.exitcode for press in presses] == [0] * PRESSES
+
+    db.session.expire_all()
+    sent = SentMessage.query.filter_by(short_id=7).one()
+    assert (sent.status, sent.response) == ('responded', 'yes')
+    assert db.session.scalar(db.select(db.func.sum(DailyStat.responded_count))) == 1
+    answers = [
+        action.payload['text'] for action in OutboundAction.query
+        if action.method == 'answerCallbackQuery'
+    ]
+    assert len(answers) == PRESSES
+    assert answers.count('Recorded: yes') == 1
+    assert answers.count('You already responded to this message.') == PRESSES - 1
+    assert OutboundAction.query.filter_by(method='editMessageText').count() == 1
@@ -0,0 +1,94 @@
+import multiprocessing
+import time
+from datetime import datetime
+
+from sqlalchemy import func
+
+from app import create_app
+from app.extensions import db
+from app.models import DailyStat, Schedule, SentMessage, User
+from app.scheduler import jobs
+from tests.conftest import make_message, make_schedule, make_user
+
+
+def _fake_send(user, message, short_id):
+    time.sleep(0.002)
+    return short_id
+
+
+def _dispatch_in_child(config, barrier):
+    jobs.send_scheduled_message = _fake_send
+    app = create_app(config)
+    barrier.wait()
+    jobs.process_due_messages(app)
+
+
+def test_workers_never_send_a_schedule_twice(app):
+    user = make_user()
+    message = make_message(user)
+    for _ in range(120):
+        make_schedule(user, message)
+    db.session.commit()
+
+    config = {
+        'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI'],
+        'BACKGROUND_JOBS': False,
+        'SCHEDULER_LEADER_ELECTION': False,
+        'SCHEDULER_CONCURRENCY': 1,
+        'SCHEDULER_CLAIM_BATCH': 10,
+    }
+    ctx = multiprocessing.get_context('fork')
+    barrier = ctx.Barrier(4)
+    workers = [ctx.Process(target=_dispatch_in_child, args=(config, barrier)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+    assert [worker.exitcode for worker in workers] == [0, 0, 0, 0]
+
+    db.session.expire_all()
+    assert SentMessage.query.count() == 120
+    assert db.session.scalar(db.select(func.count(func.distinct(SentMessage.schedule_id)))) == 120
+    assert db.session.scalar(db.select(func.count(func.distinct(SentMessage.short_id)))) == 120
+    assert SentMessage.query.filter(SentMessage.telegram_message_id.is_(None)).count() == 0
+    assert Schedule.query.filter(Schedule.claimed_by.isnot(None)).count() == 0
+
+
+def test_claimed_schedules_are_skipped(app):
+    user = make_user()
+    message = make_message(user)
+    make_schedule(user, message)
+    make_schedule(user, message)
+    db.session.commit()
+
+    now = datetime.utcnow()
+    assert len(jobs.claim_due_schedules(now, 1, 300)) == 1
+    assert len(jobs.claim_due_schedules(now, 10, 300)) == 1
+    assert jobs.claim_due_schedules(now, 10, 300) == []
+
+
+def test_a_batch_that_cannot_be_recorded_is_still_released_and_counted(app, monkeypatch):
+    user = make_user()
+    message = make_message(user)
+    make_schedule(user, message)
+    db.session.commit()
+    monkeypatch.setattr(jobs, 'send_scheduled_message', _fake_send)
+    failures = iter([RuntimeError('outcome commit failed')])
+    record_sent = jobs.record_sent
+
+    def flaky_record_sent(rows):
+        for error in failures:
+            raise error
+        record_sent(rows)
+
+    monkeypatch.setattr(jobs, 'record_sent', flaky_record_sent)
+    jobs.process_due_messages(app)
+
+    db.session.expire_all()
+    schedule = Schedule.query.one()
+    assert schedule.claimed_by is None
+    assert schedule.next_run_at > datetime.utcnow()
+    sent = SentMessage.query.one()
+    assert sent.telegram_message_id == sent.short_id
+    assert db.session.scalar(db.select(func.sum(DailyStat.sent_count))) == 1
+    assert db.session.get(User, user.id).stats_version == 1
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+from app.extensions import db
+from app.models import InboundUpdate, OutboundAction, SentMessage, User
+from app.telegram import inbox, outbox
+from app.telegram.pending import ANSWERED, pending_index
+from tests.conftest import make_message, make_user
+
+
+def _start(update_id, text, chat_id=555, sender=True):
+    message = {'text': text, 'chat': {'id': chat_id}}
+    if sender:
+        message['from'] = {'username': 'someone'}
+    return {'update_id': update_id, 'message': message}
+
+
+def _press(update_id, short_id, value='yes', chat_id=100):
+    return {'update_id': update_id, 'callback_query': {
+        'id': f'cb{update_id}', 'data': f'r_{short_id}_{value}',
+        'message': {'chat': {'id': chat_id}, 'message_id': 1},
+    }}
+
+
+def _queue(*updates):
+    for update_data in updates:
+        inbox.enqueue(update_data)
+    db.session.commit()
+
+
+def _replies():
+    return [action.payload['text'] for action in OutboundAction.query.order_by(OutboundAction.id)]
+
+
+def test_a_failing_update_does_not_undo_or_repeat_the_rest_of_its_batch(app):
+    user = User(
+        email='new@example.com', password_hash='x', linking_code='ABC123',
+        linking_code_expires=datetime.utcnow() + timedelta(minutes=5),
+    )
+    db.session.add(user)
+    _queue(_start(1, '/start ABC123'), _start(2, '/start', sender=False))
+
+    assert inbox.drain() == 1
+
+    db.session.expire_all()
+    assert User.query.filter_by(email='new@example.com').one().bot_linked
+    assert len(_replies()) == 1
+    assert _replies()[0].startswith('Your Telegram account has been linked')
+    failed = InboundUpdate.query.one()
+    assert (failed.update_id, failed.status, failed.attempts) == (2, 'pending', 1)
+
+
+def test_a_rolled_back_press_does_not_hide_the_message(app):
+    user = make_user()
+    message = make_message(user)
+    db.session.add(SentMessage(message_id=message.id, user_id=user.id, short_id=7))
+    db.session.commit()
+    malformed = {'update_id': 3, 'callback_query': {'data': 'r_7_yes'}}
+    _queue(_press(1, 7), _press(2, 7), malformed)
+
+    assert inbox.drain() == 2
+
+    db.session.expire_all()
+    sent = SentMessage.query.one()
+    assert (sent.status, sent.response) == ('responded', 'yes')
+    assert pending_index.get(7) == ANSWERED
+    assert _replies().count('Recorded: yes') == 1
+    assert _replies().count('You already responded to this message.') == 1
+
+
+def test_a_press_costs_two_bot_api_calls(app, bot_api):
+    user = make_user()
+    message = make_message(user)
+    db.session.add(SentMessage(message_id=message.id, user_id=user.id, short_id=7))
+    db.session.commit()
+    _queue(_press(1, 7))
+
+    assert inbox.drain() == 1
+    assert outbox.drain() == 2
+
+    assert [method for method, _ in bot_api] == ['answerCallbackQuery', 'editMessageText']
+    edit = bot_api[1][1]
+    assert edit['text'] == 'Did you?\n\nYou answered: *yes*'
+    assert edit['reply_markup'] == {'inline_keyboard': []}